@@ -0,0 +1,106 @@
+import math
+
+import numpy as np
+
+
+class PivotSampler:
+    """
+    Centrality estimated from the shortest paths of a sample of pivot sources instead of all of them. Pivots are
+    drawn without replacement, uniformly or stratified by square tiles of tileSize cells so that every part of the
+    map gets sources in proportion to its size. Every pivot stands for weight = stratum size / pivots in the stratum
+    sources, which keeps the estimates unbiased. errorBound gives the Hoeffding bound on the largest error over all
+    nodes that holds with probability confidence. Successive samples come from one generator seeded with seed.
+    """
+
+    def __init__(self, numOfPivots, strategy="uniform", tileSize=5, seed=None, confidence=0.95):
+        if strategy not in ["uniform", "stratified"]:
+            raise ValueError("Unknown pivot sampling strategy: %s" % strategy)
+        self.numOfPivots = int(numOfPivots)
+        self.strategy = strategy
+        self.tileSize = tileSize
+        self.seed = int(np.random.SeedSequence().entropy) if seed is None else int(seed)
+        self.generator = np.random.default_rng(self.seed)
+        self.confidence = confidence
+
+    def samplePivots(self, nodes, strata=None):
+        # (pivots, weights), every node is a pivot of weight 1 when there are not more nodes than pivots
+        if len(nodes) <= self.numOfPivots:
+            return list(nodes), [1.0] * len(nodes)
+        groups = {}
+        if self.strategy == "stratified" and strata is not None:
+            for position, stratum in enumerate(strata):
+                groups.setdefault(stratum, []).append(position)
+        # a stratum without pivots would bias the estimate, with fewer pivots than strata the sample is uniform
+        if len(groups) == 0 or len(groups) > self.numOfPivots:
+            groups = {None: list(range(len(nodes)))}
+
+        pivots, weights = [], []
+        for members, numOfPivots in zip(groups.values(), self.allocatePivots([len(members) for members in groups.values()])):
+            for position in self.generator.choice(len(members), numOfPivots, replace=False).tolist():
+                pivots.append(nodes[members[position]])
+                weights.append(len(members) / numOfPivots)
+        return pivots, weights
+
+    def allocatePivots(self, sizes):
+        # one pivot per stratum and the rest in proportion to the room left in each, largest shares first
+        sizes = np.array(sizes, dtype=np.int64)
+        allocation = np.ones(len(sizes), dtype=np.int64)
+        while allocation.sum() < self.numOfPivots:
+            remaining = self.numOfPivots - int(allocation.sum())
+            room = sizes - allocation
+            shares = remaining * room / room.sum()
+            extra = np.floor(shares).astype(np.int64)
+            if extra.sum() == 0:
+                extra[np.argsort(-shares, kind="stable")[:remaining]] = 1
+            allocation += np.minimum(extra, room)
+        return allocation.tolist()
+
+    def errorBound(self, weights, scale, numOfNodes):
+        # every pivot adds weight * scale at most to an estimate, Hoeffding with a union bound over the nodes, and
+        # with every node a pivot the estimate is exact
+        if len(weights) >= numOfNodes:
+            return 0.0
+        spread = sum((weight * scale) ** 2 for weight in weights)
+        return math.sqrt(math.log(2 * numOfNodes / (1 - self.confidence)) * spread / 2)
+
+    def betweenness(self, graph, strata=None):
+        """
+        Estimate of networkx.betweenness_centrality(graph) with its normalization, from Brandes dependency
+        accumulation over the pivots only. Returns the values by node and the error bound.
+        """
+        nodes = list(graph)
+        numOfNodes = len(nodes)
+        dependencies = dict.fromkeys(nodes, 0.0)
+        pivots, weights = self.samplePivots(nodes, strata)
+        for pivot, weight in zip(pivots, weights):
+            accumulateDependencies(graph.adj, pivot, dependencies, weight)
+        if numOfNodes <= 2:
+            return dependencies, 0.0
+        # a dependency is at most numOfNodes - 2, normalized by (numOfNodes - 1) * (numOfNodes - 2) as networkx does
+        scale = 1 / ((numOfNodes - 1) * (numOfNodes - 2))
+        values = {node: dependency * scale for node, dependency in dependencies.items()}
+        return values, self.errorBound(weights, 1 / (numOfNodes - 1), numOfNodes)
+
+
+def accumulateDependencies(adjacency, source, dependencies, weight=1.0):
+    # Brandes: count the shortest paths from the source with a BFS, then push dependencies back up in reverse order
+    distances = {source: 0}
+    numOfPaths = {source: 1}
+    predecessors = {source: []}
+    order = [source]
+    for node in order:
+        for neighbour in adjacency[node]:
+            if neighbour not in distances:
+                distances[neighbour] = distances[node] + 1
+                numOfPaths[neighbour] = 0
+                predecessors[neighbour] = []
+                order.append(neighbour)
+            if distances[neighbour] == distances[node] + 1:
+                numOfPaths[neighbour] += numOfPaths[node]
+                predecessors[neighbour].append(node)
+    delta = dict.fromkeys(order, 0.0)
+    for node in reversed(order):
+        for predecessor in predecessors[node]:
+            delta[predecessor] += numOfPaths[predecessor] / numOfPaths[node] * (1 + delta[node])
+        if node != source:
+            dependencies[node] += weight * delta[node]
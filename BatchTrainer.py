@@ -0,0 +1,140 @@
+import time
+
+import numpy as np
+
+from TrainingEngine import TrainingEngine
+
+
+class BatchTrainer(TrainingEngine):
+    """
+    Q-learning for K independent agents stepped in lockstep. Every agent runs on one of the given environments
+    (all of the same grid size) and owns its slice of a (K, states, actions) Q array, so action selection, TD updates
+    and episode/convergence bookkeeping are done for all agents at once with array operations.
+    """
+
+    def __init__(self, seed=None):
+        super(BatchTrainer, self).__init__()
+        self.seed = seed
+        self.maxNumOfEpisodes = 100000
+
+    def applyBatchQLearning(self, environments, numOfAgents=None):
+
+        # one agent per environment by default, otherwise agents are spread over the environments in turn
+        if numOfAgents is None:
+            numOfAgents = len(environments)
+        gridSizes = set(tuple(environment.gridSize) for environment in environments)
+        if len(gridSizes) != 1:
+            raise ValueError("All environments of a batch must have the same grid size.")
+        for environment in environments:
+            self.checkEnvironment(environment)
+
+        self.isTraining = True
+        startTime = time.perf_counter()
+        rng = self.openRandomStream().generator
+
+        # per map data holders, shape (maps, states, actions) and (maps, states)
+        transitionTables = np.stack([environment.transitionTable for environment in environments])
+        validActions = transitionTables >= 0
+        immRewards = np.stack([np.where(np.arange(transitionTables.shape[1]) == environment.getStateId(environment.goalCoordinates), environment.stateList[environment.goalCoordinates].immReward, 0.0) for environment in environments])
+        hasActions = validActions.any(axis=-1)
+
+        # per agent data holders
+        agents = np.arange(numOfAgents)
+        mapOfAgent = agents % len(environments)
+        startStates = np.array([environments[m].getStateId(environments[m].startCoordinates) for m in mapOfAgent])
+        goalStates = np.array([environments[m].getStateId(environments[m].goalCoordinates) for m in mapOfAgent])
+        QValues = np.where(validActions[mapOfAgent], 0.0, -np.inf)
+        currentStates = startStates.copy()
+        epsilons = np.full(numOfAgents, float(self.maxEpsilon))
+        numOfActionsInEpisode = np.zeros(numOfAgents, dtype=np.int64)
+        numOfEpisodes = np.zeros(numOfAgents, dtype=np.int64)
+        totalNumOfActions = np.zeros(numOfAgents, dtype=np.int64)
+        detector = self.convergenceDetector
+        detector.reset(numOfAgents)
+        converged = np.zeros(numOfAgents, dtype=bool)
+        stopReasons = np.full(numOfAgents, None, dtype=object)
+        active = np.ones(numOfAgents, dtype=bool)
+        stepsPerEpisode = [[] for _ in agents]
+
+        # lockstep action loop
+        while active.any():
+            agentIds = np.flatnonzero(active)
+            maps = mapOfAgent[agentIds]
+            states = currentStates[agentIds]
+
+            # epsilon greedy choice, same rule as State.getOption
+            QRows = QValues[agentIds, states]
+            bestActions = QRows.argmax(axis=1)
+            explore = (QRows[np.arange(len(agentIds)), bestActions] == 0) | (rng.random(len(agentIds)) <= epsilons[agentIds])
+            validRows = validActions[maps, states]
+            randomRanks = (rng.random(len(agentIds)) * validRows.sum(axis=1)).astype(np.int64)
+            randomActions = (np.cumsum(validRows, axis=1) > randomRanks[:, None]).argmax(axis=1)
+            chosenActions = np.where(explore, randomActions, bestActions)
+
+            # TD update, max-Q of the next state includes its immediate reward as State.getMaxQValue does
+            nextStates = transitionTables[maps, states, chosenActions]
+            nextImmRewards = immRewards[maps, nextStates]
+            nextMaxQValues = np.where(hasActions[maps, nextStates], QValues[agentIds, nextStates].max(axis=1), 0.0) + nextImmRewards
+            oldQValues = QValues[agentIds, states, chosenActions]
+            QValues[agentIds, states, chosenActions] = oldQValues + self.alpha * (nextImmRewards + self.discountFactor * nextMaxQValues - oldQValues)
+
+            currentStates[agentIds] = nextStates
+            numOfActionsInEpisode[agentIds] += 1
+            if self.epsilonDecayMode == "step":
+                decaying = agentIds[epsilons[agentIds] > self.minEpsilon]
+                epsilons[decaying] *= self.epsilonDecayFactor
+
+            # episode bookkeeping for the agents that reached their goal
+            finished = agentIds[nextStates == goalStates[agentIds]]
+            if len(finished) == 0:
+                continue
+            lengths = numOfActionsInEpisode[finished]
+            for agent, length in zip(finished.tolist(), lengths.tolist()):
+                stepsPerEpisode[agent].append(length)
+            numOfEpisodes[finished] += 1
+            totalNumOfActions[finished] += lengths
+            numOfActionsInEpisode[finished] = 0
+            currentStates[finished] = startStates[finished]
+            if self.epsilonDecayMode == "episode":
+                decaying = finished[epsilons[finished] > self.minEpsilon]
+                epsilons[decaying] *= self.epsilonDecayFactor
+
+            if self.trainUntilConvergence:
+                stopped = detector.update(lengths, finished, QValues[finished] if detector.requiresQValues else None)
+                converged[finished] = detector.stopReasons[finished] == "converged"
+                done = finished[stopped | (numOfEpisodes[finished] >= self.maxNumOfEpisodes)]
+                stopReasons[done] = np.where(detector.stopReasons[done] == None, "episodes", detector.stopReasons[done])
+            else:
+                done = finished[numOfEpisodes[finished] >= self.numOfEpisodesForTraining]
+                stopReasons[done] = "episodes"
+            active[done] = False
+
+        self.isTraining = False
+        wallTime = time.perf_counter() - startTime
+        self.batchQValues = QValues
+
+        # the fields of TrainingEngine.finishTraining for every agent, the batch has no greedy path stopping
+        optimalPathLengths = [int(environment.getOptimalDistances()[environment.getStateId(environment.startCoordinates)]) for environment in environments]
+        results = []
+        for agent in agents.tolist():
+            recentSteps = stepsPerEpisode[agent][-self.convergenceInterval:]
+            optimalPathLength = optimalPathLengths[mapOfAgent[agent]]
+            results.append({
+                "algorithm": "QL",
+                "agent": agent,
+                "mapFile": environments[mapOfAgent[agent]].mapFileName,
+                "episodes": int(numOfEpisodes[agent]),
+                "actions": int(totalNumOfActions[agent]),
+                "converged": bool(converged[agent]),
+                "stopReason": stopReasons[agent],
+                "reachedOptimalPath": False,
+                "shortestRecentEpisode": min(recentSteps),
+                "optimalPathLength": optimalPathLength,
+                "finalEpsilon": float(epsilons[agent]),
+                "wallTime": wallTime,
+                "seed": self.randomStream.seed,
+                "stepsPerEpisode": stepsPerEpisode[agent],
+            })
+            if self.verbose:
+                print("QL agent %d %s %d episodes, %d actions, shortest recent episode has %d actions, optimal path has %d actions." % (agent, "converged in" if converged[agent] else "trained for", numOfEpisodes[agent], totalNumOfActions[agent], min(recentSteps), optimalPathLength))
+        return results
@@ -0,0 +1,196 @@
+import json
+import os
+import tempfile
+from collections import defaultdict
+
+import numpy as np
+
+from Option import Option
+from QTable import QTable, ACTIONS
+
+CHECKPOINT_VERSION = 2
+
+
+def encodeOption(optionType, numOfCols):
+    # primitive actions are 0..3, the option to subgoal "row_col" is 4 + the subgoal state id
+    if isinstance(optionType, (int, np.integer)):
+        return int(optionType)
+    if optionType in ACTIONS:
+        return ACTIONS.index(optionType)
+    row, col = optionType.split("_")
+    return len(ACTIONS) + int(row) * numOfCols + int(col)
+
+
+def decodeOption(code, numOfCols, backend):
+    # the object backend keys options by name, the array backend by action index and has no subgoal options
+    if code < len(ACTIONS):
+        return code if backend == "array" else ACTIONS[code]
+    if backend == "array":
+        return None
+    return "%d_%d" % divmod(code - len(ACTIONS), numOfCols)
+
+
+def stateIdFromName(name, numOfCols):
+    row, col = name.split("_")
+    return int(row) * numOfCols + int(col)
+
+
+def pairsFromSets(sets, numOfCols):
+    # {"r_c": ["r_c", ...]} -> (pairs, 2) array of (subgoal id, state id)
+    pairs = [(stateIdFromName(subGoal, numOfCols), stateIdFromName(state, numOfCols)) for subGoal, states in sets.items() for state in states]
+    return np.array(pairs, dtype=np.int64).reshape(-1, 2)
+
+
+def setsFromPairs(pairs, numOfCols):
+    sets = defaultdict(list)
+    for subGoal, state in pairs.tolist():
+        sets["%d_%d" % divmod(subGoal, numOfCols)].append("%d_%d" % divmod(state, numOfCols))
+    return sets
+
+
+def saveCheckpoint(fileName, engine, environment):
+    """
+    Writes everything learned on the environment to an uncompressed .npz file: micro option Q-values, subgoal options,
+    visit counts, the partial model, the discovered graph in the order its edges were found, the options of the
+    engine, its priority queue and random streams and epsilon with the episode and action counters, so that training
+    resumes from it in a fresh process and continues a seeded run as if it had not stopped.
+    """
+    numOfCols = environment.gridSize[1]
+    stateList = environment.stateList
+
+    # subgoal options live on the State objects only
+    optionStates, optionCodes, optionQValues = [], [], []
+    for stateId, state in enumerate(stateList.ravel().tolist()):
+        for optionType, option in state.policies["mu"].items():
+            if optionType not in ACTIONS:
+                optionStates.append(stateId)
+                optionCodes.append(encodeOption(optionType, numOfCols))
+                optionQValues.append(option.QValue)
+
+    predecessors, optionTypes, successors, rewards = [], [], [], []
+    for successor, entries in enumerate(environment.model.predecessors):
+        if entries is None:
+            continue
+        for (predecessor, optionType), reward in entries.items():
+            predecessors.append(predecessor)
+            optionTypes.append(encodeOption(optionType, numOfCols))
+            successors.append(successor)
+            rewards.append(reward)
+
+    # the subgoal detection depends on the node and adjacency order, which the edge log keeps
+    graph = environment.graph
+    edges = [(environment.getStateId(graph.coordinates[source]), environment.getStateId(graph.coordinates[destination])) for source, destination in graph.edgeLog]
+
+    # queue items are options on the object backend and stateId * 4 + action on the array backend
+    queueItems, queuePriorities = engine.PQueue.getHeap()
+    queueStates = [item // 4 if isinstance(item, int) else item.sourceState for item in queueItems]
+    queueCodes = [item % 4 if isinstance(item, int) else encodeOption(item.optionType, numOfCols) for item in queueItems]
+    queueQValues = [0.0 if isinstance(item, int) else item.QValue for item in queueItems]
+    sampler = engine.centralitySampler
+    maxPredecessorsPerState = environment.model.maxPredecessorsPerState
+
+    # written next to fileName and moved over it, an interrupted save leaves the previous checkpoint intact
+    fileDescriptor, temporaryPath = tempfile.mkstemp(suffix=".npz.tmp", dir=os.path.dirname(os.path.abspath(fileName)))
+    try:
+        with os.fdopen(fileDescriptor, "wb") as checkpointFile:
+            np.savez(
+                checkpointFile,
+                version=CHECKPOINT_VERSION,
+                gridSize=np.array(environment.gridSize, dtype=np.int64),
+                mapMatrix=environment.mapMatrix.astype("U1"),
+                startCoordinates=np.array(environment.startCoordinates, dtype=np.int64),
+                goalCoordinates=np.array(environment.goalCoordinates, dtype=np.int64),
+                QValues=engine.getQValueSnapshot(environment),
+                optionStates=np.array(optionStates, dtype=np.int64),
+                optionCodes=np.array(optionCodes, dtype=np.int64),
+                optionQValues=np.array(optionQValues, dtype=np.float64),
+                numberOfVisits=environment.numberOfVisits,
+                lastVisitEpisode=environment.lastVisitEpisode,
+                episodeId=environment.episodeId,
+                partialMapMatrix=environment.partialMapMatrix.astype("U1"),
+                modelPredecessors=np.array(predecessors, dtype=np.int64),
+                modelOptions=np.array(optionTypes, dtype=np.int64),
+                modelSuccessors=np.array(successors, dtype=np.int64),
+                modelRewards=np.array(rewards, dtype=np.float64),
+                maxPredecessorsPerState=-1 if maxPredecessorsPerState is None else maxPredecessorsPerState,
+                graphEdges=np.array(edges, dtype=np.int64).reshape(-1, 2),
+                initiationSets=pairsFromSets(graph.initiationSets, numOfCols),
+                options=pairsFromSets(engine.options, numOfCols),
+                epsilon=engine.currentEpsilon,
+                queueStates=np.array(queueStates, dtype=np.int64),
+                queueCodes=np.array(queueCodes, dtype=np.int64),
+                queuePriorities=np.array(queuePriorities, dtype=np.float64),
+                queueQValues=np.array(queueQValues, dtype=np.float64),
+                randomState="" if engine.randomStream is None else engine.randomStream.getState(),
+                samplerState="" if sampler is None else json.dumps(sampler.generator.bit_generator.state),
+                subgoalGeneration=engine.subgoalGeneration,
+                numOfEpisodes=engine.numOfEpisodes,
+                totalNumOfActions=engine.totalNumOfActions,
+            )
+        os.replace(temporaryPath, fileName)
+    except BaseException:
+        os.remove(temporaryPath)
+        raise
+
+
+def loadCheckpoint(fileName, engine, environment):
+    # restores a checkpoint onto an environment with the same map, the next training run of the engine continues it
+    with np.load(fileName, allow_pickle=False) as checkpoint:
+        data = {name: checkpoint[name] for name in checkpoint.files}
+
+    if int(data["version"]) != CHECKPOINT_VERSION:
+        raise ValueError("Unsupported checkpoint version: %d" % int(data["version"]))
+    if tuple(data["gridSize"].tolist()) != tuple(environment.gridSize) or not np.array_equal(data["mapMatrix"], environment.mapMatrix.astype("U1")):
+        raise ValueError("%s was saved for a different map." % fileName)
+
+    # the goal cell carries the reward that the Q-values were learned for
+    if tuple(data["goalCoordinates"].tolist()) != tuple(environment.goalCoordinates):
+        raise ValueError("%s was saved with the goal at %s, the environment has it at %s." % (fileName, tuple(data["goalCoordinates"].tolist()), tuple(environment.goalCoordinates)))
+
+    numOfCols = environment.gridSize[1]
+    environment.startCoordinates = tuple(data["startCoordinates"].tolist())
+    stateList = environment.stateList
+
+    # Q-values go to a fresh QTable and from there to the micro options of the states
+    environment.resetLearning()
+    table = QTable(environment.mapMatrix, environment.goalCoordinates, stateList[environment.goalCoordinates].immReward)
+    table.QValues[...] = np.where(table.validActions, data["QValues"].reshape(table.QValues.shape), -np.inf)
+    table.exportToStateList(stateList)
+    environment.QTable = table
+    for stateId, code, QValue in zip(data["optionStates"].tolist(), data["optionCodes"].tolist(), data["optionQValues"].tolist()):
+        stateList[divmod(stateId, numOfCols)].addOption(decodeOption(code, numOfCols, "object"), QValue=QValue)
+
+    environment.numberOfVisits[...] = data["numberOfVisits"]
+    environment.lastVisitEpisode[...] = data["lastVisitEpisode"]
+    environment.episodeId = int(data["episodeId"])
+
+    maxPredecessorsPerState = int(data["maxPredecessorsPerState"])
+    environment.model.maxPredecessorsPerState = None if maxPredecessorsPerState < 0 else maxPredecessorsPerState
+    environment.resetMapProperties()
+    environment.partialMapMatrix[...] = data["partialMapMatrix"]
+    for predecessor, code, successor, reward in zip(data["modelPredecessors"].tolist(), data["modelOptions"].tolist(), data["modelSuccessors"].tolist(), data["modelRewards"].tolist()):
+        optionType = decodeOption(code, numOfCols, engine.backend)
+        if optionType is not None:
+            environment.model.insert(predecessor, optionType, successor, reward)
+    for source, destination in data["graphEdges"].tolist():
+        environment.graph.addEdge(divmod(source, numOfCols), divmod(destination, numOfCols))
+    environment.graph.replaceInitiationSets(setsFromPairs(data["initiationSets"], numOfCols))
+
+    engine.options = setsFromPairs(data["options"], numOfCols)
+    engine.resumePoint = (int(data["numOfEpisodes"]), int(data["totalNumOfActions"]), float(data["epsilon"]))
+
+    # the rest of the run state is put back by the engine when the next run starts
+    queueItems = []
+    for state, code, QValue in zip(data["queueStates"].tolist(), data["queueCodes"].tolist(), data["queueQValues"].tolist()):
+        if engine.backend == "array":
+            queueItems.append(state * 4 + code)
+            continue
+        # an option removed from its state after it was queued is still backed up once when it is popped
+        optionType = decodeOption(code, numOfCols, "object")
+        coordinates = divmod(state, numOfCols)
+        option = stateList[coordinates].policies["mu"].get(optionType)
+        queueItems.append(option if option is not None else Option(optionType, coordinates, QValue, environment.gridSize))
+    samplerState = str(data["samplerState"])
+    if samplerState and engine.centralitySampler is not None:
+        engine.centralitySampler.generator.bit_generator.state = json.loads(samplerState)
+    engine.resumeState = {"queue": (queueItems, data["queuePriorities"].tolist()), "randomState": str(data["randomState"]), "subgoalGeneration": int(data["subgoalGeneration"])}
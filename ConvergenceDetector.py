@@ -0,0 +1,220 @@
+import abc
+
+import numpy as np
+
+from PolicyEvaluator import greedyPathLengths, greedyPolicy
+
+
+class ConvergenceDetector(abc.ABC):
+    """
+    Decides after every episode whether training can stop. Detectors keep their state for a number of agents so that
+    TrainingEngine (one agent) and BatchTrainer (K agents) share them: update() takes the episode length of one agent
+    (agents an int) or of several agents (agents an index array) and answers with a bool or a bool array.
+    Detectors with requiresQValues set also get the Q-values of those agents, shaped (agents, states, actions).
+    Detectors without supportsOptions judge the primitive actions only and cannot follow PS with subgoal options.
+    stopReasons holds why each agent stopped, stopReason of the detector that fired ("converged" for a convergence
+    criterion) or None while it runs.
+    """
+
+    requiresQValues = False
+    supportsOptions = True
+    stopReason = "converged"
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self, numOfAgents=1):
+        self.numOfAgents = numOfAgents
+        self.stopReasons = np.full(numOfAgents, None, dtype=object)
+
+    def update(self, numOfActions, agents=0, QValues=None):
+        isScalar = np.ndim(agents) == 0
+        agents = np.atleast_1d(agents)
+        numOfActions = np.atleast_1d(numOfActions).astype(np.int64)
+        if QValues is not None:
+            QValues = np.asarray(QValues).reshape(len(agents), -1)
+        converged = np.asarray(self.updateAgents(agents, numOfActions, QValues), dtype=bool)
+        self.stopReasons[agents[converged]] = self.getStopReasons(agents)[converged]
+        return bool(converged[0]) if isScalar else converged
+
+    @abc.abstractmethod
+    def updateAgents(self, agents, numOfActions, QValues):
+        # bool array, True for the agents that can stop after their last episode
+        pass
+
+    def getStopReasons(self, agents):
+        # why the agents that the last updateAgents call stopped did stop
+        return np.full(len(agents), self.stopReason, dtype=object)
+
+
+class VarianceDetector(ConvergenceDetector):
+    # sample variance of the last windowSize episode lengths, kept with running integer sums so each update is O(1)
+
+    def __init__(self, windowSize=15, threshold=0.3):
+        self.windowSize = int(windowSize)
+        self.threshold = threshold
+        super(VarianceDetector, self).__init__()
+
+    def reset(self, numOfAgents=1):
+        super(VarianceDetector, self).reset(numOfAgents)
+        self.window = np.zeros((numOfAgents, self.windowSize), dtype=np.int64)
+        self.counts = np.zeros(numOfAgents, dtype=np.int64)
+        self.sums = np.zeros(numOfAgents, dtype=np.int64)
+        self.sumsOfSquares = np.zeros(numOfAgents, dtype=np.int64)
+
+    def updateAgents(self, agents, numOfActions, QValues):
+        positions = self.counts[agents] % self.windowSize
+        leaving = np.where(self.counts[agents] >= self.windowSize, self.window[agents, positions], 0)
+        self.window[agents, positions] = numOfActions
+        self.sums[agents] += numOfActions - leaving
+        self.sumsOfSquares[agents] += numOfActions * numOfActions - leaving * leaving
+        self.counts[agents] += 1
+        return (self.counts[agents] >= self.windowSize) & (self.getVariance(agents) <= self.threshold)
+
+    def getVariance(self, agents=None):
+        # same value as statistics.variance over the window
+        n = self.windowSize
+        sums = self.sums if agents is None else self.sums[agents]
+        sumsOfSquares = self.sumsOfSquares if agents is None else self.sumsOfSquares[agents]
+        return (n * sumsOfSquares - sums * sums) / float(n * (n - 1))
+
+
+class QValueChangeDetector(ConvergenceDetector):
+    # largest Q-value change between consecutive episodes, relative to the largest Q-value, stays below threshold
+
+    requiresQValues = True
+
+    def __init__(self, threshold=0.001, patience=15):
+        self.threshold = threshold
+        self.patience = patience
+        super(QValueChangeDetector, self).__init__()
+
+    def reset(self, numOfAgents=1):
+        super(QValueChangeDetector, self).reset(numOfAgents)
+        self.previousQValues = None
+        self.calmEpisodes = np.zeros(numOfAgents, dtype=np.int64)
+
+    def updateAgents(self, agents, numOfActions, QValues):
+        # actions heading walls hold -inf in the array backends
+        QValues = np.where(np.isfinite(QValues), QValues, 0.0)
+        if self.previousQValues is None:
+            self.previousQValues = np.zeros((self.numOfAgents, QValues.shape[1]))
+        change = np.abs(QValues - self.previousQValues[agents]).max(axis=1)
+        scale = np.maximum(np.abs(QValues).max(axis=1), np.finfo(np.float64).tiny)
+        self.previousQValues[agents] = QValues
+        calm = change / scale <= self.threshold
+        self.calmEpisodes[agents] = np.where(calm, self.calmEpisodes[agents] + 1, 0)
+        return self.calmEpisodes[agents] >= self.patience
+
+
+class PolicyStabilityDetector(ConvergenceDetector):
+    # greedy action of every state unchanged for patience consecutive episodes
+
+    requiresQValues = True
+
+    def __init__(self, patience=15, numOfActions=4):
+        self.patience = patience
+        self.numOfActions = numOfActions
+        super(PolicyStabilityDetector, self).__init__()
+
+    def reset(self, numOfAgents=1):
+        super(PolicyStabilityDetector, self).reset(numOfAgents)
+        self.previousPolicies = None
+        self.stableEpisodes = np.zeros(numOfAgents, dtype=np.int64)
+
+    def updateAgents(self, agents, numOfActions, QValues):
+        policies = QValues.reshape(len(agents), -1, self.numOfActions).argmax(axis=2)
+        if self.previousPolicies is None:
+            self.previousPolicies = np.full((self.numOfAgents, policies.shape[1]), -1, dtype=np.int64)
+        stable = (policies == self.previousPolicies[agents]).all(axis=1)
+        self.previousPolicies[agents] = policies
+        self.stableEpisodes[agents] = np.where(stable, self.stableEpisodes[agents] + 1, 0)
+        return self.stableEpisodes[agents] >= self.patience
+
+
+class GreedyRolloutDetector(ConvergenceDetector):
+    # every interval episodes the greedy policy is rolled out from the start states, converged once it reaches the
+    # goal from all of them with unchanged path lengths for patience evaluations in a row. The rollouts take
+    # primitive actions only, so it is not used for PS, whose agent acts through its subgoal options
+
+    supportsOptions = False
+
+    def __init__(self, transitionTable, goalState, startStates, interval=10, patience=2):
+        self.transitionTable = transitionTable
+        self.goalState = goalState
+        self.startStates = np.atleast_1d(startStates)
+        self.interval = interval
+        self.patience = patience
+        super(GreedyRolloutDetector, self).__init__()
+
+    @property
+    def requiresQValues(self):
+        # Q-values are only needed on evaluation episodes
+        return bool(((self.counts + 1) % self.interval == 0).any())
+
+    def reset(self, numOfAgents=1):
+        super(GreedyRolloutDetector, self).reset(numOfAgents)
+        self.counts = np.zeros(numOfAgents, dtype=np.int64)
+        self.stableEvaluations = np.zeros(numOfAgents, dtype=np.int64)
+        self.pathLengths = np.full((numOfAgents, len(self.startStates)), -1, dtype=np.int64)
+
+    def updateAgents(self, agents, numOfActions, QValues):
+        self.counts[agents] += 1
+        if QValues is not None:
+            for index in np.flatnonzero(self.counts[agents] % self.interval == 0).tolist():
+                agent = agents[index]
+                pathLengths = greedyPathLengths(greedyPolicy(QValues[index], self.transitionTable.shape[1]), self.transitionTable, self.goalState)[self.startStates]
+                stable = (pathLengths >= 0).all() and (pathLengths == self.pathLengths[agent]).all()
+                self.stableEvaluations[agent] = self.stableEvaluations[agent] + 1 if stable else 0
+                self.pathLengths[agent] = pathLengths
+        return self.stableEvaluations[agents] >= self.patience
+
+
+class StepBudgetDetector(ConvergenceDetector):
+    # stops once an agent has taken maxNumOfActions actions in total, which is not convergence
+
+    stopReason = "budget"
+
+    def __init__(self, maxNumOfActions):
+        self.maxNumOfActions = maxNumOfActions
+        super(StepBudgetDetector, self).__init__()
+
+    def reset(self, numOfAgents=1):
+        super(StepBudgetDetector, self).reset(numOfAgents)
+        self.totalNumOfActions = np.zeros(numOfAgents, dtype=np.int64)
+
+    def updateAgents(self, agents, numOfActions, QValues):
+        self.totalNumOfActions[agents] += numOfActions
+        return self.totalNumOfActions[agents] >= self.maxNumOfActions
+
+
+class CombinedDetector(ConvergenceDetector):
+    # any (or all) of the given detectors
+
+    def __init__(self, detectors, mode="any"):
+        self.detectors = detectors
+        self.mode = mode
+        super(CombinedDetector, self).__init__()
+
+    @property
+    def requiresQValues(self):
+        return any(detector.requiresQValues for detector in self.detectors)
+
+    @property
+    def supportsOptions(self):
+        return all(detector.supportsOptions for detector in self.detectors)
+
+    def reset(self, numOfAgents=1):
+        super(CombinedDetector, self).reset(numOfAgents)
+        for detector in self.detectors:
+            detector.reset(numOfAgents)
+
+    def updateAgents(self, agents, numOfActions, QValues):
+        self.results = np.array([detector.updateAgents(agents, numOfActions, QValues) for detector in self.detectors], dtype=bool)
+        return self.results.any(axis=0) if self.mode == "any" else self.results.all(axis=0)
+
+    def getStopReasons(self, agents):
+        # converged when any convergence criterion fired, otherwise the reason of the first detector that did
+        reasons = np.where(self.results, np.array([detector.getStopReasons(agents) for detector in self.detectors], dtype=object), None)
+        firstReasons = reasons[self.results.argmax(axis=0), np.arange(len(agents))]
+        return np.where((reasons == "converged").any(axis=0), "converged", firstReasons)
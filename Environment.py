@@ -1,7 +1,9 @@
 import numpy as np
 
 from GraphXv2 import GraphX
-from GridCellButton import GridCellButton
+from PartialModel import PartialModel
+from Planner import shortestPathLengths
+from QTable import ACTION_OFFSETS, WALL_BITS, wallCodesFromMapMatrix
 from State import State
 
 
@@ -14,12 +16,14 @@ class Environment:
 
         # data holders
         self.stateList = np.empty(shape=self.gridSize, dtype=State)
-        self.buttonList = np.empty(shape=self.gridSize, dtype=GridCellButton)
+        self.buttonList = np.empty(shape=self.gridSize, dtype=object)
         self.mapMatrix = np.empty(shape=self.gridSize, dtype=str)
         self.mapMatrix[:] = "0"
         self.mapFileName = "unsavedMap"
         self.partialMapMatrix = np.full(shape=self.gridSize, fill_value="X", dtype=str)
-        self.model = {}
+        self.model = PartialModel(gridSize[0] * gridSize[1])
+        self.QTable = None
+        self.optimalDistances = None
         self.immRewardAtGoal = 50
         self.graph = GraphX()
         self.startCoordinates = (0, 0)
@@ -36,6 +40,11 @@ class Environment:
         # add immediate reward
         self.stateList[gridSize[0] - 1][gridSize[1] - 1].isGoal = True
 
+        # keep the map matrix and the transition table in line with the border walls
+        self.updateMapMatrixFromStateList()
+        self.compileTransitionTable()
+        self.resetVisitInformation()
+
     def updateStateListFromMapMatrix(self):
         self.stateList = np.empty(shape=self.gridSize, dtype=State)
         for row in range(0, self.gridSize[0]):
@@ -43,8 +52,12 @@ class Environment:
                 self.stateList[row][col] = State(self.mapMatrix[row][col], (row, col), self.gridSize)
         self.deleteActionsHeadingWalls()
         self.stateList[self.goalCoordinates].isGoal = True
+        self.compileTransitionTable()
+        self.resetVisitInformation()
 
     def updateButtonListFromStateList(self):
+        # imported here so that headless training does not need Qt
+        from GridCellButton import GridCellButton
         self.buttonList = np.empty(shape=self.gridSize, dtype=GridCellButton)
         for row in range(0, self.gridSize[0]):
             for col in range(0, self.gridSize[1]):
@@ -58,36 +71,83 @@ class Environment:
             for col in range(0, self.gridSize[1]):
                 self.mapMatrix[row, col] = self.stateList[row][col].stateType
 
+    def compileTransitionTable(self):
+        # transitionTable[state, action] is the next state id (row * cols + col) or -1 when a wall blocks the action
+        numOfRows, numOfCols = self.gridSize
+        wallCodes = wallCodesFromMapMatrix(self.mapMatrix).reshape(-1)
+        rows, cols = np.divmod(np.arange(numOfRows * numOfCols), numOfCols)
+        self.transitionTable = np.empty((numOfRows * numOfCols, len(ACTION_OFFSETS)), dtype=np.int64)
+        self.optimalDistances = None
+        for action, (rowOffset, colOffset) in enumerate(ACTION_OFFSETS):
+            self.transitionTable[:, action] = ((rows + rowOffset) % numOfRows) * numOfCols + (cols + colOffset) % numOfCols
+            self.transitionTable[(wallCodes & WALL_BITS[action]) != 0, action] = -1
+
+    def resetVisitInformation(self):
+        # a state counts as visited in an episode when its stamp equals the current episode id,
+        # so starting an episode is a counter increment instead of a pass over the grid
+        self.numberOfVisits = np.zeros(self.gridSize, dtype=np.int64)
+        self.lastVisitEpisode = np.zeros(self.gridSize[0] * self.gridSize[1], dtype=np.int64)
+        self.episodeId = 0
+
+    def beginEpisode(self):
+        self.episodeId += 1
+        return self.episodeId
+
+    def getOptimalDistances(self):
+        # shortest path lengths to the goal, cached until the walls or the goal change
+        goalState = self.getStateId(self.goalCoordinates)
+        if self.optimalDistances is None or self.optimalDistances[0] != goalState:
+            self.optimalDistances = (goalState, shortestPathLengths(self.transitionTable, goalState))
+        return self.optimalDistances[1]
+
+    def getStateId(self, coordinates):
+        return coordinates[0] * self.gridSize[1] + coordinates[1]
+
+    def updateTransitions(self, row, col):
+        # recompile the transitions of a single state after its wall code changed
+        numOfRows, numOfCols = self.gridSize
+        wallCode = int(self.mapMatrix[row, col], 16)
+        self.optimalDistances = None
+        for action, (rowOffset, colOffset) in enumerate(ACTION_OFFSETS):
+            if wallCode & WALL_BITS[action]:
+                self.transitionTable[row * numOfCols + col, action] = -1
+            else:
+                self.transitionTable[row * numOfCols + col, action] = ((row + rowOffset) % numOfRows) * numOfCols + (col + colOffset) % numOfCols
+        if self.QTable is not None:
+            self.QTable.setValidActions(row, col, self.transitionTable[row * numOfCols + col] >= 0)
+
     def toggleWall(self, mask, row, col, isNeighbour):
         currentState = bin(int(self.stateList[row][col].stateType, 16))[2:].zfill(4)
         newState = "".join([str(int(a) ^ int(b)) for a, b in zip(currentState, mask)])
         newStateHex = format(int(newState, 2), "x").upper()
         self.stateList[row][col].stateType = newStateHex
         self.mapMatrix[row][col] = newStateHex
-        self.buttonList[row][col].stateType = newStateHex
+        if self.buttonList[row][col] is not None:
+            self.buttonList[row][col].stateType = newStateHex
         if mask == "0001":
             neighbourRow = (row + 1) % self.gridSize[0]
             neighbourCol = col
             neighbourMask = "0100"
-            actionToBeToggled = "DOWN"
+            actionToBeToggled = "D"
         elif mask == "0010":
             neighbourRow = row
             neighbourCol = (col + 1) % self.gridSize[1]
             neighbourMask = "1000"
-            actionToBeToggled = "RIGHT"
+            actionToBeToggled = "R"
         elif mask == "0100":
-            neighbourRow = row - 1
+            neighbourRow = (row - 1) % self.gridSize[0]
             neighbourCol = col
             neighbourMask = "0001"
-            actionToBeToggled = "UP"
+            actionToBeToggled = "U"
         elif mask == "1000":
             neighbourRow = row
-            neighbourCol = col - 1
+            neighbourCol = (col - 1) % self.gridSize[1]
             neighbourMask = "0010"
-            actionToBeToggled = "LEFT"
+            actionToBeToggled = "L"
         else:
             return
         self.stateList[row][col].toggleOption(actionToBeToggled)
+        self.updateTransitions(row, col)
         if isNeighbour:
             return
         self.toggleWall(neighbourMask, neighbourRow, neighbourCol, True)
@@ -131,8 +191,30 @@ class Environment:
         for row in range(0, self.gridSize[0]):
             for col in range(0, self.gridSize[1]):
                 self.stateList[row][col].resetState()
-                self.stateList[row][col].numberOfVisits = 0
+        self.numberOfVisits[:] = 0
 
     def resetMapProperties(self):
         self.partialMapMatrix = np.full(shape=self.gridSize, fill_value="X", dtype=str)
         self.graph = GraphX()
+        self.model = PartialModel(self.gridSize[0] * self.gridSize[1], self.model.maxPredecessorsPerState)
+
+
+def loadEnvironment(fileName):
+    # .gwmap layout: start coordinates, goal coordinates, an empty line and the hex wall code matrix
+    with open(fileName, "r") as mapFile:
+        startCoordinates = tuple(int(cd) for cd in mapFile.readline().split())
+        goalCoordinates = tuple(int(cd) for cd in mapFile.readline().split())
+    mapMatrix = np.genfromtxt(fileName, dtype="str", skip_header=3)
+    if len(startCoordinates) != 2 or len(goalCoordinates) != 2:
+        raise ValueError("Start or goal coordinates are not valid in %s." % fileName)
+    if any(not 0 <= cd[i] < mapMatrix.shape[i] for cd in [startCoordinates, goalCoordinates] for i in range(2)):
+        raise ValueError("Start and goal must be inside the grid in %s." % fileName)
+
+    environment = Environment(mapMatrix.shape)
+    environment.mapMatrix = mapMatrix
+    environment.mapFileName = fileName
+    environment.startCoordinates = startCoordinates
+    environment.goalCoordinates = goalCoordinates
+    environment.updateStateListFromMapMatrix()
+    environment.resetMapProperties()
+    return environment
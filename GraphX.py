@@ -3,9 +3,10 @@ import networkx as nx
 
 
 class GraphX:
-    def __init__(self, map):
+    def __init__(self, map, pivotSampler=None):
         self.map = map
         self.row, self.col = np.shape(self.map)
+        self.pivotSampler = pivotSampler
         self.graph = self.createMapToGraph(self.map)
         self.betcen = self.calculateBetcen(self.graph)
 
@@ -40,9 +41,14 @@ class GraphX:
         return graph
 
     def calculateBetcen(self, graph):
-        betcen = nx.betweenness_centrality(graph)
-        betweenness = np.zeros((self.row, self.col), dtype=np.float)
-        for node in graph.node:
+        # estimated from the pivots of pivotSampler when one is given, stratified by its tiles
+        if self.pivotSampler is not None:
+            tiles = [tuple(coordinate // self.pivotSampler.tileSize for coordinate in self.strToInt(node)) for node in graph]
+            betcen, self.errorBound = self.pivotSampler.betweenness(graph, tiles)
+        else:
+            betcen = nx.betweenness_centrality(graph)
+        betweenness = np.zeros((self.row, self.col), dtype=float)
+        for node in graph:
             # print(node)
         # return
             betweenness[self.strToInt(node)] = betcen[node]
@@ -1,9 +1,14 @@
-import math
-import statistics
+import time
 from collections import defaultdict
+from threading import Condition
 
 import matplotlib.pyplot as plt
 import networkx as nx
+import numpy as np
+
+from NeighbourhoodIndex import NeighbourhoodIndex
+from ParallelCentrality import countTreeOccurrences
+from SubgoalCache import edgeContent, mapContent
 
 
 class GraphX:
@@ -12,15 +17,85 @@ class GraphX:
         self.graph = nx.Graph()
         self.row = self.col = 0
         self.initiationSets = defaultdict(list)
-
-    def addEdge(self, source, destination):
-        self.graph.add_edge(self.intToStr(source), self.intToStr(destination))
+        # (row, col) of every node, kept so that callers do not parse the names
+        self.coordinates = {}
+
+        # every new edge is logged and bumps the generation, a snapshot of a generation is rebuilt from the log
+        # without touching the live graph that the trainer keeps growing
+        self.edgeLog = []
+        self.generation = 0
+        self.changed = Condition()
+        self.snapshot = None
+
+        # initiationSets is replaced, never mutated, and initiationSetsVersion counts the replacements
+        self.initiationSetsVersion = 0
+        self.initiationSetsGeneration = -1
+        self.initiationSetsKey = None
+
+        # incremental mode carries the path counts over from the previous snapshot, see updatePathCounts
+        self.incremental = False
+        self.maxIncrementalEdges = 64
+        self.maxIncrementalNodes = 4096
+        self.pathCounts = None
+
+        # with a PivotSampler the subgoals come from the BFS trees of sampled pivots only
+        self.pivotSampler = None
+        self.centralityErrorBound = 0.0
+
+        # with a CentralityPool the exact path counts are split over its processes by source
+        self.centralityPool = None
+
+        # the initiation sets of this many subgoals are filtered together as one matrix, timings of the last run
+        self.initiationSetBatchSize = 32
+        self.timings = {}
+
+        # subgoals and centrality of the last run. With a SubgoalCache, exact runs are looked up by the content of the
+        # graph: the map while the graph is the one createMapToGraph built from it, the discovered edges otherwise
+        self.subgoals = []
+        self.centrality = {}
+        self.subgoalCache = None
+        self.mapContent = None
+
+    def addEdge(self, sourceCoordinates, destinationCoordinates):
+        # nodes are named "row_col", their coordinates are kept so that the names never have to be parsed
+        source, destination = self.intToStr(sourceCoordinates), self.intToStr(destinationCoordinates)
+        if self.graph.has_edge(source, destination):
+            return
+        for name, coordinates in ((source, sourceCoordinates), (destination, destinationCoordinates)):
+            if name not in self.coordinates:
+                self.coordinates[name] = (int(coordinates[0]), int(coordinates[1]))
+        self.graph.add_edge(source, destination)
+        with self.changed:
+            self.edgeLog.append((source, destination))
+            self.generation = len(self.edgeLog)
+            self.changed.notify_all()
+
+    def waitForChange(self, generation, timeout=None):
+        # blocks until the graph grows past generation or the timeout passes, returns the current generation
+        with self.changed:
+            if self.generation == generation:
+                self.changed.wait(timeout)
+            return self.generation
+
+    def getSnapshot(self):
+        # (generation, graph) with the edges up to the current generation, in the node and adjacency order of self.graph
+        generation = self.generation
+        if self.snapshot is None or self.snapshot[0] != generation:
+            graph = nx.Graph()
+            graph.add_edges_from(self.edgeLog[:generation])
+            self.snapshot = (generation, graph)
+        return self.snapshot
+
+    def replaceInitiationSets(self, initiationSets):
+        self.initiationSets = initiationSets
+        self.initiationSetsVersion += 1
 
     def hasEdge(self, source, destination):
         return self.graph.has_edge(self.intToStr(source), self.intToStr(destination))
 
     def createMapToGraph(self, map):
         #add edges
+        isEmpty = self.generation == 0
         self.row = len(map)
         self.col = len(map[0])
         for i in range(len(map)):
@@ -30,164 +105,483 @@ class GraphX:
 
                 value = self.hexToBin4(map[i, j])
                 if not int(value[0]):   #left
-                    self.graph.add_edge(self.intToStr([i, j]), self.intToStr([i, j-1]))
+                    self.addEdge([i, j], [i, j-1])
 
                 if not int(value[1]):   #up
-                    self.graph.add_edge(self.intToStr([i, j]), self.intToStr([i-1, j]))
+                    self.addEdge([i, j], [i-1, j])
 
                 if not int(value[2]):   #right
-                    self.graph.add_edge(self.intToStr([i, j]), self.intToStr([i, j + 1]))
+                    self.addEdge([i, j], [i, j + 1])
 
                 if not int(value[3]):   #down
-                    self.graph.add_edge(self.intToStr([i, j]), self.intToStr([i+1, j]))
+                    self.addEdge([i, j], [i+1, j])
+        if isEmpty:
+            self.mapContent = (mapContent(map), self.generation)
 
     def setInitiationSets(self, minPD, minHeight, MeanFilterWindowSize, goalCoordinates):
-        # All shortest path in graph
-
-        # self.condition.acquire()
-        # while True:
-        #     graph = nx.copy.deepcopy(self.graph)
-        #     if graph:
-        #         break
-        #     self.condition.wait()  # sleep until item becomes available
-        # self.condition.release()
-
-        try:
-            graph = nx.copy.deepcopy(self.graph)
-        except:
-            return
 
-        # print("[subgoals] ", end="")
+        # nothing to do when neither the graph nor the parameters changed since the last run
+        generation, graph = self.getSnapshot()
+        key = (generation, minPD, minHeight, MeanFilterWindowSize, tuple(goalCoordinates))
+        if key == self.initiationSetsKey:
+            return
+        self.initiationSetsKey = key
 
-        initiationSets = defaultdict(list)
         if len(graph) < 15:
             return
-        path = nx.all_pairs_shortest_path(graph)
-        shortestPaths = defaultdict(list)
-        numberOfShortestPaths = 0
-        for source, dummy in path.items():
-            for destination, shortestPath in dummy.items():
-                numberOfShortestPaths = numberOfShortestPaths + 1
-                for p in shortestPath:
-                    shortestPaths[p].append(shortestPath)
 
+        # sampled results depend on the pivots drawn and are never cached
+        startTime = time.perf_counter()
+        incremental = self.incremental and len(graph) <= self.maxIncrementalNodes
+        sampled = self.pivotSampler is not None and len(graph) > self.pivotSampler.numOfPivots
+        cacheKey = None
+        if self.subgoalCache is not None and not sampled:
+            cacheKey = self.subgoalCache.makeKey(self.getContent(generation), goalCoordinates, minPD, minHeight, MeanFilterWindowSize)
+            entry = self.subgoalCache.get(cacheKey)
+            if entry is not None:
+                self.subgoals, initiationSets, self.centrality = entry
+                self.timings = {"subgoals": len(self.subgoals), "cached": time.perf_counter() - startTime}
+                self.initiationSets = initiationSets
+                self.initiationSetsGeneration = generation
+                self.initiationSetsVersion += 1
+                return
+
+        # share of all shortest paths (one BFS tree path per ordered pair) that pass through each node
+        if sampled:
+            occurrences, numberOfShortestPaths, (pivots, weights) = self.samplePathOccurrences(graph, self.pivotSampler)
+        elif incremental:
+            pathCounts = self.updatePathCounts(generation)
+            occurrences, numberOfShortestPaths = pathCounts["occurrences"], pathCounts["numberOfShortestPaths"]
+        else:
+            occurrences, numberOfShortestPaths = self.countPathOccurrences(graph)
         betcen = {}
         for node in graph:
-            betcen[node] = len(shortestPaths[node])/numberOfShortestPaths
+            betcen[node] = occurrences[node]/numberOfShortestPaths
+        pathCountTime = time.perf_counter()
 
-        #subgoal detection
-        dummyBetcen = self.weightedMeanFilter(graph, betcen, MeanFilterWindowSize)
+        # one neighbourhood index serves every filter and the peak suppression below
+        index = self.getNeighbourhoodIndex(graph, max(MeanFilterWindowSize, minPD, 5), generation)
 
-        # Peak detection by using betcen values
-        subgoals = defaultdict(list)
-        # set goal state as subgoal
-        subgoals[self.intToStr(goalCoordinates)] = shortestPaths[self.intToStr(goalCoordinates)]
+        #subgoal detection
+        dummyBetcen = index.weightedMeanFilter(index.toArray(betcen), MeanFilterWindowSize)
 
+        # Peak detection by using betcen values, goal state is the first subgoal
+        subgoals = [self.intToStr(goalCoordinates)]
         while True:
-            maxKey = max(dummyBetcen, key=dummyBetcen.get)
-            if dummyBetcen[maxKey] < minHeight:
+            maxPosition = int(dummyBetcen.argmax())
+            if dummyBetcen[maxPosition] < minHeight:
                 break
-            neighbours = nx.ego_graph(graph, maxKey, minPD)
-            for n in neighbours:
-                dummyBetcen[n] = -1
-            subgoals[maxKey] = shortestPaths[maxKey]
-
-        # print("[init] ", end="\n")
-
-        # print(len(subgoals))
+            maxKey = index.nodes[maxPosition]
+            for n in index.getNeighbours(maxKey, minPD):
+                dummyBetcen[index.positions[n]] = -1
+            if maxKey not in subgoals:
+                subgoals.append(maxKey)
 
         # define initiation set for each subgoal
-        for subgoal in subgoals:
-            numOfOccursForEachNode = defaultdict(lambda: 0)
-            totalTOccurs = 0
-            for path in subgoals[subgoal]:
-                for node in path:
-                    if node == subgoal:
-                        continue
-                    numOfOccursForEachNode[node] = numOfOccursForEachNode[node] + 1
-                    totalTOccurs = totalTOccurs + 1
-
-            numOfOccursForEachNode = self.weightedMeanFilter(graph, numOfOccursForEachNode, MeanFilterWindowSize)
-            numOfOccursForEachNode = self.weightedMeanFilter(graph, numOfOccursForEachNode, MeanFilterWindowSize)
-
-            averageOccurs = 0
-            for key, value in numOfOccursForEachNode.items():
-                averageOccurs += value
-
-            averageOccurs /= len(numOfOccursForEachNode)
-
-            dummyInitiationSet = defaultdict(lambda: 0)
-
-            for node in graph:
-                if numOfOccursForEachNode[node] >= averageOccurs:
-                    dummyInitiationSet[node] = 1
-
-            dummyInitiationSet = self.medianFilter(graph, dummyInitiationSet, 5)
-            dummyInitiationSet = self.medianFilter(graph, dummyInitiationSet, 5)
-            dummyInitiationSet = self.medianFilter(graph, dummyInitiationSet, 5)
-            for node in graph:
-                if dummyInitiationSet[node] and (not subgoal == node):
-                    initiationSets[subgoal].append(node)
+        detectionTime = time.perf_counter()
+        if sampled:
+            subgoalOccurrences = self.countSubgoalPathOccurrences(graph, subgoals, pivots, weights)
+        elif incremental:
+            subgoalOccurrences = self.updateSubgoalPathCounts(pathCounts, subgoals)
+        else:
+            subgoalOccurrences = self.countSubgoalPathOccurrences(graph, subgoals)
+        subgoalCountTime = time.perf_counter()
+        initiationSets = self.buildInitiationSets(index, subgoals, subgoalOccurrences, MeanFilterWindowSize)
+        endTime = time.perf_counter()
+        self.timings = {"subgoals": len(subgoals), "pathCounts": pathCountTime - startTime, "subgoalDetection": detectionTime - pathCountTime, "subgoalPathCounts": subgoalCountTime - detectionTime, "initiationSets": endTime - subgoalCountTime, "perSubgoal": (endTime - detectionTime) / len(subgoals)}
+
+        self.subgoals, self.centrality = subgoals, betcen
+        if cacheKey is not None:
+            goal = self.intToStr(goalCoordinates)
+            coordinates = self.coordinates if goal in self.coordinates else dict(self.coordinates, **{goal: tuple(goalCoordinates)})
+            self.subgoalCache.put(cacheKey, subgoals, initiationSets, betcen, coordinates)
 
         self.initiationSets = initiationSets
-        # print(self.initiationSets)
+        self.initiationSetsGeneration = generation
+        self.initiationSetsVersion += 1
+
+    def getContent(self, generation):
+        # what the snapshot of generation was built from, for the subgoal cache keys
+        if self.mapContent is not None and self.mapContent[1] == generation:
+            return self.mapContent[0]
+        return edgeContent(self.edgeLog[:generation])
+
+    def buildInitiationSets(self, index, subgoals, subgoalOccurrences, MeanFilterWindowSize):
+        """
+        Occurrences on the paths through each subgoal, smoothed twice with the weighted mean filter, cut at their
+        mean and cleaned with three median filters. The rows of initiationSetBatchSize subgoals go through the
+        filters together as one (subgoals, nodes) matrix.
+        """
+        initiationSets = defaultdict(list)
+        for start in range(0, len(subgoals), self.initiationSetBatchSize):
+            batch = subgoals[start:start + self.initiationSetBatchSize]
+            numOfOccurs = index.toMatrix([subgoalOccurrences[subgoal] for subgoal in batch])
+
+            numOfOccurs = index.weightedMeanFilter(numOfOccurs, MeanFilterWindowSize)
+            numOfOccurs = index.weightedMeanFilter(numOfOccurs, MeanFilterWindowSize)
+
+            # cumsum adds each row up in order, as summing the list of a single subgoal did
+            averageOccurs = np.cumsum(numOfOccurs, axis=1)[:, -1:] / numOfOccurs.shape[1]
+
+            dummyInitiationSets = (numOfOccurs >= averageOccurs).astype(np.float64)
+
+            dummyInitiationSets = index.medianFilter(dummyInitiationSets, 5)
+            dummyInitiationSets = index.medianFilter(dummyInitiationSets, 5)
+            dummyInitiationSets = index.medianFilter(dummyInitiationSets, 5)
+            for subgoal, row in zip(batch, dummyInitiationSets):
+                for position in np.flatnonzero(row).tolist():
+                    if not subgoal == index.nodes[position]:
+                        initiationSets[subgoal].append(index.nodes[position])
+        return initiationSets
+
+    def shortestPathTree(self, graph, source):
+        # BFS tree of networkx.single_source_shortest_path: a node hangs below the first node that reaches it,
+        # its path from the source is the chain of parents. Returns the nodes in BFS order, parents and subtree sizes
+        adjacency = graph.adj
+        parents = {source: None}
+        order = [source]
+        for node in order:
+            for neighbour in adjacency[node]:
+                if neighbour not in parents:
+                    parents[neighbour] = node
+                    order.append(neighbour)
+        subtreeSizes = dict.fromkeys(order, 1)
+        for node in reversed(order[1:]):
+            subtreeSizes[parents[node]] += subtreeSizes[node]
+        return order, parents, subtreeSizes
+
+    def countPathOccurrences(self, graph):
+        # a node lies on the paths from the source to every node of its subtree, so summing subtree sizes over all
+        # sources counts its shortest path occurrences without storing any path
+        if self.centralityPool is not None:
+            nodes, positions, offsets, neighbours = self.getAdjacencyArrays(graph)
+            occurrences, numberOfShortestPaths, subgoalOccurrences = self.centralityPool.countPathOccurrences(offsets, neighbours)
+            return dict(zip(nodes, occurrences.tolist())), numberOfShortestPaths
+        occurrences = dict.fromkeys(graph, 0)
+        numberOfShortestPaths = 0
+        for source in graph:
+            numberOfShortestPaths += self.addTreeOccurrences(self.shortestPathTree(graph, source), occurrences)
+        return occurrences, numberOfShortestPaths
+
+    def countSubgoalPathOccurrences(self, graph, subgoals, sources=None, weights=None):
+        # occurrences on the paths through every subgoal from the BFS trees of the sources (node positions, all
+        # nodes by default) counted weight times, all subgoals of a tree in one array update
+        counts = {subgoal: dict.fromkeys(graph, 0) for subgoal in subgoals}
+        nodes, positions, offsets, neighbours = self.getAdjacencyArrays(graph)
+        foundSubgoals = [subgoal for subgoal in subgoals if subgoal in positions]
+        subgoalPositions = [positions[subgoal] for subgoal in foundSubgoals]
+        sources = range(len(nodes)) if sources is None else sources
+        if self.centralityPool is not None:
+            subgoalOccurrences = self.centralityPool.countPathOccurrences(offsets, neighbours, sources, subgoalPositions, weights)[2]
+        else:
+            subgoalOccurrences = countTreeOccurrences(offsets, neighbours, sources, subgoalPositions, weights)[2]
+        for subgoal, row in zip(foundSubgoals, subgoalOccurrences.tolist()):
+            counts[subgoal] = dict(zip(nodes, row))
+        return counts
+
+    def samplePathOccurrences(self, graph, sampler):
+        # unbiased estimate of countPathOccurrences from the BFS trees of the pivots, which are returned as positions
+        # with their weights for the subgoal counts. The number of paths, every ordered pair inside a component, is exact
+        nodes, positions, offsets, neighbours = self.getAdjacencyArrays(graph)
+        pivots, weights = sampler.samplePivots(nodes, self.getTiles(nodes, sampler.tileSize))
+        pivots = [positions[pivot] for pivot in pivots]
+        occurrences = dict(zip(nodes, countTreeOccurrences(offsets, neighbours, pivots, weights=weights)[0].tolist()))
+        numberOfShortestPaths = sum(len(component) ** 2 for component in nx.connected_components(graph))
+        # a pivot adds at most its weight times the number of nodes to an occurrence count
+        self.centralityErrorBound = sampler.errorBound(weights, len(nodes) / numberOfShortestPaths, len(nodes))
+        return occurrences, numberOfShortestPaths, (pivots, weights)
+
+    def getAdjacencyArrays(self, graph):
+        # (nodes, positions, offsets, neighbours), graph as CSR arrays in its node and adjacency order. Graphs only
+        # grow, the path counts graph of incremental mode in place, so the number of edges tells their versions apart
+        arrays = getattr(self, "adjacencyArrays", None)
+        if arrays is None or arrays[0] is not graph or arrays[1] != graph.number_of_edges():
+            nodes = list(graph)
+            positions = {node: position for position, node in enumerate(nodes)}
+            offsets = np.zeros(len(nodes) + 1, dtype=np.int64)
+            np.cumsum([len(graph.adj[node]) for node in nodes], out=offsets[1:])
+            neighbours = np.array([positions[neighbour] for node in nodes for neighbour in graph.adj[node]], dtype=np.int64)
+            arrays = self.adjacencyArrays = (graph, graph.number_of_edges(), nodes, positions, offsets, neighbours)
+        return arrays[2:]
+
+    def getTiles(self, nodes, tileSize):
+        # strata of stratified pivot sampling, square tiles of tileSize cells
+        return [(self.coordinates[node][0] // tileSize, self.coordinates[node][1] // tileSize) for node in nodes]
+
+    def addTreeOccurrences(self, tree, occurrences, weight=1):
+        # adds the paths of one BFS tree weight times to the occurrences (-1 removes them), returns the number of paths
+        order, parents, subtreeSizes = tree
+        for node in order:
+            occurrences[node] += weight * subtreeSizes[node]
+        return len(order)
+
+    def addTreeSubgoalOccurrences(self, tree, counts, weight=1):
+        # for every subgoal, how often each other node appears on the shortest paths through the subgoal: nodes above
+        # the subgoal share its subtree size, nodes below it are counted with their own subtree size
+        order, parents, subtreeSizes = tree
+        children = defaultdict(list)
+        for node in order[1:]:
+            children[parents[node]].append(node)
+        for subgoal, subgoalCounts in counts.items():
+            if subgoal not in parents:
+                continue
+            ancestor = parents[subgoal]
+            while ancestor is not None:
+                subgoalCounts[ancestor] += weight * subtreeSizes[subgoal]
+                ancestor = parents[ancestor]
+            stack = list(children[subgoal])
+            while stack:
+                node = stack.pop()
+                subgoalCounts[node] += weight * subtreeSizes[node]
+                stack.extend(children[node])
+
+    def updatePathCounts(self, generation):
+        """
+        Path occurrence counts of the snapshot of generation, carried over from the snapshot counted last by
+        replaying the edges added since. The BFS tree of every source is kept as a row of parent positions, which
+        takes nodes squared entries and is why incremental mode stops at maxIncrementalNodes. An edge between two
+        nodes at the same distance from a source is never a tree edge and leaves its tree as it is, a new leaf only
+        hangs below its neighbour in every tree, the trees of the other sources are recounted. Long gaps and batches
+        that would recount the trees of more than half of the nodes are counted from scratch. Only the counts carry
+        over: every centrality value changes with the number of paths, so the filters, peaks and initiation sets are
+        derived from them again.
+        """
+        pathCounts = self.pathCounts
+        if pathCounts is not None and 0 <= generation - pathCounts["generation"] <= self.maxIncrementalEdges:
+            budget = len(pathCounts["graph"]) // 2
+            for source, destination in self.edgeLog[pathCounts["generation"]:generation]:
+                budget = self.addEdgeToPathCounts(pathCounts, source, destination, budget)
+                if budget is None:
+                    break
+                pathCounts["generation"] += 1
+            else:
+                return pathCounts
+        subgoals = list(pathCounts["subgoalCounts"]) if pathCounts is not None else []
+        pathCounts = self.pathCounts = self.countAllPaths(generation, subgoals)
+        return pathCounts
+
+    def countAllPaths(self, generation, subgoals):
+        # counts of the snapshot of generation from scratch, the subgoals tracked so far are counted in the same pass
+        graph = nx.Graph()
+        graph.add_edges_from(self.edgeLog[:generation])
+        pathCounts = {"generation": generation, "graph": graph, "nodes": [], "positions": {}, "parents": self.allocateParents(len(graph)), "occurrences": {}, "numberOfShortestPaths": 0, "subgoalCounts": {subgoal: {} for subgoal in subgoals}}
+        for node in graph:
+            self.addPathCountsNode(pathCounts, node)
+        for source in graph:
+            self.addSourceToPathCounts(pathCounts, source)
+        return pathCounts
+
+    def allocateParents(self, numOfNodes):
+        # parent positions of the tree of every source, a quarter of the nodes as room to grow up to
+        # maxIncrementalNodes, int16 while positions fit: 32 MiB for 4096 nodes
+        capacity = max(numOfNodes, min(max(64, numOfNodes + numOfNodes // 4), self.maxIncrementalNodes))
+        return np.full((capacity, capacity), -1, dtype=np.int16 if capacity <= np.iinfo(np.int16).max else np.int32)
+
+    def addPathCountsNode(self, pathCounts, node):
+        parents = pathCounts["parents"]
+        position = len(pathCounts["nodes"])
+        if position == len(parents):
+            pathCounts["parents"] = self.allocateParents(position + 1)
+            pathCounts["parents"][:position, :position] = parents
+        pathCounts["nodes"].append(node)
+        pathCounts["positions"][node] = position
+        pathCounts["occurrences"][node] = 0
+        for subgoalCounts in pathCounts["subgoalCounts"].values():
+            subgoalCounts[node] = 0
+
+    def addSourceToPathCounts(self, pathCounts, source, sign=1):
+        tree = self.shortestPathTree(pathCounts["graph"], source)
+        pathCounts["numberOfShortestPaths"] += sign * self.addTreeOccurrences(tree, pathCounts["occurrences"], sign)
+        self.addTreeSubgoalOccurrences(tree, pathCounts["subgoalCounts"], sign)
+        if sign > 0:
+            order, parents, subtreeSizes = tree
+            positions = pathCounts["positions"]
+            row = pathCounts["parents"][positions[source]]
+            row[:] = -1
+            row[[positions[node] for node in order[1:]]] = [positions[parents[node]] for node in order[1:]]
+
+    def addEdgeToPathCounts(self, pathCounts, source, destination, budget):
+        # returns the budget of trees left to recount, None without touching the counts when the edge exceeds it
+        graph = pathCounts["graph"]
+        if (source in graph) != (destination in graph):
+            if destination in graph:
+                source, destination = destination, source
+            self.addLeafToPathCounts(pathCounts, source, destination)
+            return budget - 1
+
+        affected = self.findAffectedSources(pathCounts, source, destination)
+        if len(affected) > budget:
+            return None
+        for node in affected:
+            self.addSourceToPathCounts(pathCounts, node, -1)
+        newNodes = [node for node in [source, destination] if node not in graph]
+        graph.add_edge(source, destination)
+        for node in newNodes:
+            self.addPathCountsNode(pathCounts, node)
+        for node in affected + newNodes:
+            self.addSourceToPathCounts(pathCounts, node)
+        return budget - len(affected) - len(newNodes)
+
+    def findAffectedSources(self, pathCounts, source, destination):
+        """
+        Sources whose BFS tree changes when the edge is added. The distance of every source to each end is the depth
+        of the end in its tree, read by walking the parent rows of all trees up at once, as many steps as the end
+        is deep. Ends at equal distances or unreachable from the source leave the tree as it is. Ends one step apart
+        change it only if the nearer end is dequeued before the current parent of the farther one: both chains are
+        walked up to their common ancestor, where adjacency order decides. Any larger gap shortens paths and always
+        changes the tree.
+        """
+        graph = pathCounts["graph"]
+        if source not in graph or destination not in graph:
+            return []
+        positions, nodes, parents = pathCounts["positions"], pathCounts["nodes"], pathCounts["parents"]
+        sources = np.arange(len(nodes))
+        sourceDepths = self.getTreeDepths(parents, sources, positions[source])
+        destinationDepths = self.getTreeDepths(parents, sources, positions[destination])
+        gaps = np.abs(sourceDepths - destinationDepths)
+        changing = sourceDepths != destinationDepths
+        affected = [nodes[position] for position in np.flatnonzero(changing & ((sourceDepths < 0) | (destinationDepths < 0) | (gaps > 1))).tolist()]
+        nearSource = changing & (gaps == 1) & (sourceDepths >= 0) & (destinationDepths >= 0)
+        candidates = {source: np.flatnonzero(nearSource & (sourceDepths < destinationDepths)), destination: np.flatnonzero(nearSource & (destinationDepths < sourceDepths))}
+
+        adjacency = graph.adj
+        for near, far in [(source, destination), (destination, source)]:
+            if not len(candidates[near]):
+                continue
+            sources = candidates[near]
+            farChain = parents[sources, positions[far]]
+            nearChain = np.full(len(sources), positions[near])
+            while True:
+                farParents, nearParents = parents[sources, farChain], parents[sources, nearChain]
+                apart = farParents != nearParents
+                if not apart.any():
+                    break
+                farChain = np.where(apart, farParents, farChain)
+                nearChain = np.where(apart, nearParents, nearChain)
+            commonAncestors = parents[sources, farChain]
+            for sourcePosition, farChild, nearChild, ancestor in zip(sources.tolist(), farChain.tolist(), nearChain.tolist(), commonAncestors.tolist()):
+                neighbours = list(adjacency[nodes[ancestor]])
+                if neighbours.index(nodes[nearChild]) < neighbours.index(nodes[farChild]):
+                    affected.append(nodes[sourcePosition])
+        return affected
+
+    def getTreeDepths(self, parents, sources, position):
+        # depth of the node at position in the tree of every source, -1 where the tree does not reach it
+        depths = np.where((parents[sources, position] >= 0) | (sources == position), 0, -1)
+        walking = np.flatnonzero(depths == 0)
+        chain = np.full(len(walking), position)
+        while len(walking):
+            chain = parents[sources[walking], chain]
+            climbing = chain >= 0
+            walking, chain = walking[climbing], chain[climbing]
+            depths[walking] += 1
+        return depths
+
+    def addLeafToPathCounts(self, pathCounts, node, leaf):
+        # the leaf is the last child of node in every tree that reaches node, so it adds one path to the leaf for
+        # every ancestor of node in those trees and a tree of its own
+        pathCounts["graph"].add_edge(node, leaf)
+        self.addPathCountsNode(pathCounts, leaf)
+        nodes, positions, parents = pathCounts["nodes"], pathCounts["positions"], pathCounts["parents"]
+        position, leafPosition = positions[node], positions[leaf]
+
+        # walk up the trees of all sources at once, chain[k] holds the k-th ancestor of the leaf per source
+        sources = np.flatnonzero(parents[:leafPosition, position] >= 0)
+        sources = np.append(sources, position)
+        chain = [np.full(len(sources), position)]
+        while True:
+            ancestors = parents[sources, np.maximum(chain[-1], 0)]
+            ancestors[chain[-1] < 0] = -1
+            if (ancestors < 0).all():
+                break
+            chain.append(ancestors)
+        parents[sources, leafPosition] = position
+        chain = np.array(chain)
+
+        occurrences = np.bincount(chain[chain >= 0], minlength=len(nodes))
+        occurrences[leafPosition] += len(sources)
+        for node, count in zip(nodes, occurrences.tolist()):
+            pathCounts["occurrences"][node] += count
+        pathCounts["numberOfShortestPaths"] += len(sources)
+
+        # subgoals above the leaf gain it in their subtree, every other node of the chain and the leaf gain a path
+        for subgoal, subgoalCounts in pathCounts["subgoalCounts"].items():
+            if subgoal == leaf:
+                counts = occurrences - (np.arange(len(nodes)) == leafPosition) * len(sources)
+                for changed in np.flatnonzero(counts).tolist():
+                    subgoalCounts[nodes[changed]] += int(counts[changed])
+                continue
+            if subgoal not in positions:
+                continue
+            throughSubgoal = (chain == positions[subgoal]).any(axis=0)
+            if not throughSubgoal.any():
+                continue
+            subgoalChain = chain[:, throughSubgoal]
+            counts = np.bincount(subgoalChain[(subgoalChain >= 0) & (subgoalChain != positions[subgoal])], minlength=len(nodes))
+            counts[leafPosition] += int(throughSubgoal.sum())
+            for changed in np.flatnonzero(counts).tolist():
+                subgoalCounts[nodes[changed]] += int(counts[changed])
+
+        self.addSourceToPathCounts(pathCounts, leaf)
+
+    def updateSubgoalPathCounts(self, pathCounts, subgoals):
+        # counts of subgoals kept from earlier snapshots were updated with the edges, new subgoals are counted here
+        tracked = pathCounts["subgoalCounts"]
+        for subgoal in list(tracked):
+            if subgoal not in subgoals:
+                del tracked[subgoal]
+        missing = [subgoal for subgoal in subgoals if subgoal not in tracked]
+        if missing:
+            tracked.update(self.countSubgoalPathOccurrences(pathCounts["graph"], missing))
+        return tracked
+
+    def getNeighbourhoodIndex(self, graph, radius, generation=None):
+        # built once per graph snapshot and reused by every filter with a radius it covers, in incremental mode the
+        # index of an earlier snapshot only searches the rows around the edges added since
+        index = getattr(self, "neighbourhoodIndex", None)
+        if index is not None and index.graph is graph and index.radius >= radius:
+            return index
+        previousGeneration = getattr(self, "neighbourhoodIndexGeneration", None)
+        if self.incremental and index is not None and index.radius == radius and generation is not None and previousGeneration is not None and 0 <= generation - previousGeneration <= self.maxIncrementalEdges:
+            changedNodes = set(node for edge in self.edgeLog[previousGeneration:generation] for node in edge)
+            index = index.update(graph, changedNodes)
+        else:
+            index = NeighbourhoodIndex(graph, radius)
+        self.neighbourhoodIndex, self.neighbourhoodIndexGeneration = index, generation
+        return index
 
     def medianFilter(self, graph, data, medianSize):
-        medFilt = {}
-        for currentNode in graph:
-            neighbours = nx.ego_graph(graph, currentNode, medianSize)
-            medianList = []
-            for n in neighbours:
-                medianList.append(data[n])
-            medFilt[currentNode] = math.ceil(statistics.median(medianList))
-
-        return medFilt
+        index = self.getNeighbourhoodIndex(graph, medianSize)
+        return dict(zip(index.nodes, index.medianFilter(index.toArray(data), medianSize).astype(np.int64).tolist()))
 
     def meanFilter(self, graph, data, meanSize):
-        meanFilt = {}
-        for currentNode in graph:
-            neighbours = nx.ego_graph(graph, currentNode, meanSize)
-            meanValue = 0
-            for n in neighbours:
-                meanValue = meanValue + data[n]
-
-            meanFilt[currentNode] = meanValue/len(neighbours)
-        return meanFilt
+        index = self.getNeighbourhoodIndex(graph, meanSize)
+        return index.toDict(index.meanFilter(index.toArray(data), meanSize))
 
     def weightedMeanFilter(self, graph,  data, meanSize):
-        meanFilt = {}
-        for currentNode in graph:
-            neighbours = nx.ego_graph(graph, currentNode, meanSize)
-            meanValue = 0
-            for n in neighbours:
-                dist = len(nx.shortest_path(graph, source=currentNode, target=n)) - 1
-                meanValue = meanValue + data[currentNode]/(1 + dist)
-
-            meanFilt[currentNode] = meanValue/len(neighbours)
-        return meanFilt
+        index = self.getNeighbourhoodIndex(graph, meanSize)
+        return index.toDict(index.weightedMeanFilter(index.toArray(data), meanSize))
 
     def intToStr(self, coordinate):
         return str(coordinate[0]) + "_" + str(coordinate[1])
 
-    def strToInt(self, s):
-        x, y = s.split("_")
-        return [int(x), int(y)]
-
     def hexToBin4(self, number):
        return str('{0:04b}'.format(int(number, 16)))
 
-    def buildPosDict(self):
-        posDict = dict()
-        for node in self.graph:
-            posDict[node] = self.strToInt(node)
-
     def drawGraph(self):
         posDict = dict()
         colorList = []
-        bc = nx.betweenness_centrality(self.graph)
+        if self.pivotSampler is not None:
+            bc, self.centralityErrorBound = self.pivotSampler.betweenness(self.graph, self.getTiles(list(self.graph), self.pivotSampler.tileSize))
+        elif self.centralityPool is not None and len(self.graph) > 2:
+            nodes, positions, offsets, neighbours = self.getAdjacencyArrays(self.graph)
+            values = self.centralityPool.betweenness(offsets, neighbours, np.arange(len(nodes)), np.ones(len(nodes)))
+            bc = dict(zip(nodes, (values / ((len(nodes) - 1) * (len(nodes) - 2))).tolist()))
+        else:
+            bc = nx.betweenness_centrality(self.graph)
 
         for node in self.graph:
-            pos = self.strToInt(node)
+            pos = self.coordinates[node]
             posDict[node] = [pos[1], self.row - pos[0] - 1]
             colorList.append(bc[node])
 
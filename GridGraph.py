@@ -0,0 +1,109 @@
+import numpy as np
+
+from QTable import ACTION_OFFSETS, WALL_BITS
+
+
+class GridGraph:
+    """
+    Undirected graph of a grid map keyed by the integer cell ids row * numOfCols + col, built straight from the hex
+    wall codes. The neighbours of cell i are neighbours[offsets[i]:offsets[i + 1]] in L, U, R, D order. A side is
+    open when either of its two cells has no wall there, as GraphX adds an edge from both ends, and sides wrap
+    around the borders like Environment.transitionTable. Unknown ("X") cells are closed. nodes are the cells with
+    at least one edge. accumulateBetweenness is also what CentralityPool.betweenness runs in its processes.
+    """
+
+    def __init__(self, mapMatrix):
+        mapMatrix = np.asarray(mapMatrix)
+        self.numOfRows, self.numOfCols = mapMatrix.shape
+        numOfCells = self.numOfRows * self.numOfCols
+        wallCodes = np.array([15 if digit == "X" else int(digit, 16) for digit in mapMatrix.ravel()], dtype=np.int64)
+        rows, cols = np.divmod(np.arange(numOfCells), self.numOfCols)
+
+        # (cells, directions) table of neighbour ids, -1 where the side is closed from both cells
+        table = np.empty((numOfCells, len(ACTION_OFFSETS)), dtype=np.int64)
+        for direction, (rowOffset, colOffset) in enumerate(ACTION_OFFSETS):
+            table[:, direction] = ((rows + rowOffset) % self.numOfRows) * self.numOfCols + (cols + colOffset) % self.numOfCols
+        isOpen = (wallCodes[:, None] & np.array(WALL_BITS)) == 0
+        opposite = [2, 3, 0, 1]
+        isOpen |= isOpen[table, opposite]
+        # narrow grids wrap onto the cell itself or reach one neighbour from two sides, keep a single edge
+        isOpen &= table != np.arange(numOfCells)[:, None]
+        for direction in range(1, len(ACTION_OFFSETS)):
+            for earlier in range(direction):
+                isOpen[:, direction] &= ~(isOpen[:, earlier] & (table[:, earlier] == table[:, direction]))
+
+        self.offsets = np.zeros(numOfCells + 1, dtype=np.int64)
+        np.cumsum(isOpen.sum(axis=1), out=self.offsets[1:])
+        self.neighbours = table[isOpen]
+        self.nodes = np.flatnonzero(np.diff(self.offsets) > 0)
+
+    def betweenness(self, sources=None, weights=None, normalized=True, pool=None):
+        """
+        Brandes betweenness of every cell, exact over all nodes or from the given sources each counted weight
+        times, split over the processes of a CentralityPool when one is given. Normalized as networkx does for
+        undirected graphs.
+        """
+        sources = self.nodes if sources is None else np.asarray(sources, dtype=np.int64)
+        weights = np.ones(len(sources)) if weights is None else np.asarray(weights, dtype=np.float64)
+        if pool is not None:
+            values = pool.betweenness(self.offsets, self.neighbours, sources, weights)
+        else:
+            values = accumulateBetweenness(self.offsets, self.neighbours, sources, weights)
+
+        numOfNodes = len(self.nodes)
+        if normalized and numOfNodes > 2:
+            values /= (numOfNodes - 1) * (numOfNodes - 2)
+        elif not normalized:
+            values /= 2
+        return values
+
+
+def expandFrontier(offsets, neighbours, frontier):
+    # (degrees, neighbours) of the frontier, the neighbours of all its nodes concatenated in frontier order
+    starts = offsets[frontier]
+    counts = offsets[frontier + 1] - starts
+    positions = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+    return counts, neighbours[positions]
+
+
+def accumulateBetweenness(offsets, neighbours, sources, weights, batchSize=64):
+    """
+    Sum over the sources of weight times the Brandes dependencies of every node of the CSR graph. Sources are
+    processed batchSize at a time with (batch, nodes) arrays: path counts flow down and dependencies back up the
+    BFS levels of the whole batch at once.
+    """
+    numOfCells = len(offsets) - 1
+    values = np.zeros(numOfCells)
+    for start in range(0, len(sources), batchSize):
+        batch = sources[start:start + batchSize]
+        rows = np.arange(len(batch))
+        distances = np.full((len(batch), numOfCells), -1, dtype=np.int64)
+        numOfPaths = np.zeros((len(batch), numOfCells))
+        distances[rows, batch] = 0
+        numOfPaths[rows, batch] = 1
+        flatPaths = numOfPaths.reshape(-1)
+        frontierRows, frontier = rows, batch
+        levels = []
+        distance = 0
+        while len(frontier):
+            distance += 1
+            counts, edgeTargets = expandFrontier(offsets, neighbours, frontier)
+            edgeRows, edgeSources = np.repeat(frontierRows, counts), np.repeat(frontier, counts)
+            targetDistances = distances[edgeRows, edgeTargets]
+            isNew = targetDistances < 0
+            distances[edgeRows[isNew], edgeTargets[isNew]] = distance
+            # edges of the shortest path DAG go one level down
+            onPath = isNew | (targetDistances == distance)
+            edgeRows, edgeSources, edgeTargets = edgeRows[onPath], edgeSources[onPath], edgeTargets[onPath]
+            np.add.at(flatPaths, edgeRows * numOfCells + edgeTargets, flatPaths[edgeRows * numOfCells + edgeSources])
+            levels.append((edgeRows, edgeSources, edgeTargets))
+            frontierRows, frontier = np.divmod(np.unique(edgeRows * numOfCells + edgeTargets), numOfCells)
+
+        dependencies = np.zeros((len(batch), numOfCells))
+        flatDependencies = dependencies.reshape(-1)
+        for edgeRows, edgeSources, edgeTargets in reversed(levels):
+            sourceKeys, targetKeys = edgeRows * numOfCells + edgeSources, edgeRows * numOfCells + edgeTargets
+            np.add.at(flatDependencies, sourceKeys, flatPaths[sourceKeys] / flatPaths[targetKeys] * (1 + flatDependencies[targetKeys]))
+        dependencies[rows, batch] = 0
+        values += weights[start:start + batchSize] @ dependencies
+    return values
@@ -12,6 +12,7 @@ from PySide import QtCore, QtGui
 from PySide.QtCore import QSize
 
 from GraphXv2 import GraphX
+from GridGraph import GridGraph
 
 from RLTask import RLTask
 from Environment import Environment
@@ -101,6 +102,10 @@ class MainUI(QtGui.QMainWindow):
         startPS = QtGui.QAction(QtGui.QIcon(""), "Start PS", self)
         startPS.setShortcut("Ctrl+P")
         startPS.triggered.connect(self.RLTask.PSThreadStart)
+        saveCheckpoint = QtGui.QAction(QtGui.QIcon("images/save-bw.png"), "Save Checkpoint", self)
+        saveCheckpoint.triggered.connect(self.saveCheckpointFile)
+        loadCheckpoint = QtGui.QAction(QtGui.QIcon("images/open-bw.ico"), "Load Checkpoint", self)
+        loadCheckpoint.triggered.connect(self.loadCheckpointFile)
         mapOps = self.menuBar.addMenu("&Map Operations")
         mapOps.addAction(loadMap)
         mapOps.addAction(saveMap)
@@ -119,6 +124,8 @@ class MainUI(QtGui.QMainWindow):
         trainingOps = self.menuBar.addMenu("&Training")
         trainingOps.addAction(startQL)
         trainingOps.addAction(startPS)
+        trainingOps.addAction(saveCheckpoint)
+        trainingOps.addAction(loadCheckpoint)
 
         # frame customization & layouts
         self.leftFrame.setStyleSheet("QFrame { background-color: wheat; border: 1px groove #f0f0f0 }")
@@ -417,7 +424,7 @@ class MainUI(QtGui.QMainWindow):
         gridSize = environment.gridSize
         for row in range(0, gridSize[0]):
             for col in range(0, gridSize[1]):
-                buttonList[row][col].setText(str(stateList[row][col].numberOfVisits))
+                buttonList[row][col].setText(str(environment.numberOfVisits[row, col]))
 
     def showOptionsOnGrid(self):
         environment = self.RLTask.environmentList[self.leftStackedLayout.currentIndex()]
@@ -427,6 +434,7 @@ class MainUI(QtGui.QMainWindow):
         mapMatrix = environment.mapMatrix
         gridSize = environment.gridSize
         gr = GraphX()
+        gr.subgoalCache = self.RLTask.mapSubgoalCache
         gr.createMapToGraph(mapMatrix)
         gr.setInitiationSets(5, 0.03, 3, environment.goalCoordinates)
         initSets = gr.initiationSets
@@ -438,20 +446,38 @@ class MainUI(QtGui.QMainWindow):
         for key, value in initSets.items():
         #     # print(key)
             subGoals.append(key)
-            subGoalRow, subGoalCol = key.split("_")
-            buttonList[int(subGoalRow)][int(subGoalCol)].setText(key)
+            subGoalRow, subGoalCol = gr.coordinates[key]
+            buttonList[subGoalRow][subGoalCol].setText(key)
 
         key = initSets["19_19"]
         print(key)
         for item in initSets["19_19"]:
-            stateRow, stateCol = item.split("_")
-            buttonList[int(stateRow)][int(stateCol)].changeBackgroundColor(colorList[colorInd])
+            stateRow, stateCol = gr.coordinates[item]
+            buttonList[stateRow][stateCol].changeBackgroundColor(colorList[colorInd])
         colorInd += 1
 
     def drawGraphFromPartialModel(self):
         environment = self.RLTask.environmentList[self.leftStackedLayout.currentIndex()]
         environment.graph.drawGraph()
 
+    def saveCheckpointFile(self):
+        environment = self.RLTask.environmentList[self.leftStackedLayout.currentIndex()]
+        fileName = QtGui.QFileDialog.getSaveFileName(self, "Save Checkpoint", "outputFiles/", "Checkpoints (*.npz)")
+        if fileName[0]:
+            self.RLTask.saveCheckpoint(environment, fileName[0])
+            QtGui.QMessageBox.information(self, "Information", "Checkpoint successfully saved.")
+
+    def loadCheckpointFile(self):
+        environment = self.RLTask.environmentList[self.leftStackedLayout.currentIndex()]
+        fileName = QtGui.QFileDialog.getOpenFileName(self, "Load Checkpoint", "outputFiles/", "Checkpoints (*.npz)")
+        if os.path.isfile(fileName[0]):
+            try:
+                self.RLTask.loadCheckpoint(environment, fileName[0])
+            except ValueError as error:
+                QtGui.QMessageBox.critical(self, "Error", str(error))
+                return
+            self.showMaxOptionsOnGrid()
+
     def printMapMatrix(self):
         environment = self.RLTask.environmentList[self.leftStackedLayout.currentIndex()]
         environment.updateMapMatrixFromStateList()
@@ -461,9 +487,8 @@ class MainUI(QtGui.QMainWindow):
         environment = self.RLTask.environmentList[self.leftStackedLayout.currentIndex()]
         environment.updateMapMatrixFromStateList()
         print(environment.partialMapMatrix)
-        gr = GraphX(environment.partialMapMatrix)
-        bc = gr.betcen
-        print(bc)
+        gridGraph = GridGraph(environment.partialMapMatrix)
+        print(gridGraph.betweenness().reshape(gridGraph.numOfRows, gridGraph.numOfCols))
 
     def loadMapFile(self):
 
@@ -0,0 +1,131 @@
+import numpy as np
+
+
+class NeighbourhoodIndex:
+    """
+    Nodes within radius hops of every node of a graph with their hop distances, built with one bounded BFS per node
+    and stored as CSR arrays: the neighbourhood of node i is neighbours[offsets[i]:offsets[i + 1]]. Node i is the
+    i-th node of the graph. Smaller radii are cut from it once and cached, and the graph filters run on top of it
+    as array reductions over the neighbourhoods. The filters take a vector of node values or a matrix with one
+    row of node values per signal and filter every row.
+    """
+
+    def __init__(self, graph, radius, previous=None, changedNodes=()):
+        self.graph = graph
+        self.radius = radius
+        self.nodes = list(graph)
+        self.positions = {node: position for position, node in enumerate(self.nodes)}
+
+        # rows of nodes farther than radius hops from every changed node are the same in a previous index
+        dirty = set(self.nodes) if previous is None else self.findNodesWithin(changedNodes)
+        if previous is not None:
+            full = previous.neighbourhoods[previous.radius]
+            remap = np.array([self.positions[node] for node in previous.nodes], dtype=np.int64)
+
+        neighbours = []
+        distances = []
+        counts = []
+        for source in self.nodes:
+            if source in dirty:
+                rowNeighbours, rowDistances = self.searchNeighbourhood(source)
+                neighbours.append(np.array(rowNeighbours, dtype=np.int64))
+                distances.append(np.array(rowDistances, dtype=np.int64))
+            else:
+                position = previous.positions[source]
+                start, end = full["offsets"][position], full["offsets"][position + 1]
+                neighbours.append(remap[full["neighbours"][start:end]])
+                distances.append(full["distances"][start:end])
+            counts.append(len(neighbours[-1]))
+
+        self.neighbourhoods = {radius: self.buildNeighbourhood(np.concatenate(neighbours), np.concatenate(distances), np.array(counts, dtype=np.int64))}
+
+    def searchNeighbourhood(self, source):
+        # bounded BFS, the same node set as networkx.ego_graph(graph, source, radius)
+        adjacency = self.graph.adj
+        positions = self.positions
+        seen = {source}
+        frontier = [source]
+        neighbours = [positions[source]]
+        distances = [0]
+        for distance in range(1, self.radius + 1):
+            nextFrontier = []
+            for node in frontier:
+                for neighbour in adjacency[node]:
+                    if neighbour not in seen:
+                        seen.add(neighbour)
+                        nextFrontier.append(neighbour)
+                        neighbours.append(positions[neighbour])
+                        distances.append(distance)
+            frontier = nextFrontier
+        return neighbours, distances
+
+    def findNodesWithin(self, sources):
+        adjacency = self.graph.adj
+        seen = set(node for node in sources if node in adjacency)
+        frontier = list(seen)
+        for distance in range(self.radius):
+            frontier = {neighbour for node in frontier for neighbour in adjacency[node]} - seen
+            seen.update(frontier)
+        return seen
+
+    def update(self, graph, changedNodes):
+        # index of graph, grown from the graph of this index by edges between changedNodes
+        return NeighbourhoodIndex(graph, self.radius, self, changedNodes)
+
+    def buildNeighbourhood(self, neighbours, distances, counts):
+        offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        owners = np.repeat(np.arange(len(counts)), counts)
+        return {"offsets": offsets, "neighbours": neighbours, "distances": distances, "counts": counts, "owners": owners}
+
+    def getNeighbourhood(self, radius):
+        if radius > self.radius:
+            raise ValueError("The index covers %d hops, %d were asked." % (self.radius, radius))
+        if radius not in self.neighbourhoods:
+            full = self.neighbourhoods[self.radius]
+            inside = full["distances"] <= radius
+            counts = np.bincount(full["owners"][inside], minlength=len(self.nodes))
+            self.neighbourhoods[radius] = self.buildNeighbourhood(full["neighbours"][inside], full["distances"][inside], counts)
+        return self.neighbourhoods[radius]
+
+    def getNeighbours(self, node, radius):
+        # names of the nodes within radius hops of node, node included
+        neighbourhood = self.getNeighbourhood(radius)
+        position = self.positions[node]
+        return [self.nodes[neighbour] for neighbour in neighbourhood["neighbours"][neighbourhood["offsets"][position]:neighbourhood["offsets"][position + 1]].tolist()]
+
+    def toArray(self, data):
+        # node keyed dict -> array in node order, missing nodes are 0 as with the defaultdicts of GraphX
+        return np.array([data.get(node, 0) for node in self.nodes], dtype=np.float64)
+
+    def toMatrix(self, dataList):
+        # one toArray row per node keyed dict
+        return np.array([[data.get(node, 0) for node in self.nodes] for data in dataList], dtype=np.float64).reshape(len(dataList), len(self.nodes))
+
+    def toDict(self, values):
+        return dict(zip(self.nodes, values.tolist()))
+
+    def meanFilter(self, values, radius):
+        neighbourhood = self.getNeighbourhood(radius)
+        if values.ndim > 1:
+            return np.add.reduceat(values[..., neighbourhood["neighbours"]], neighbourhood["offsets"][:-1], axis=-1) / neighbourhood["counts"]
+        return np.bincount(neighbourhood["owners"], weights=values[neighbourhood["neighbours"]], minlength=len(self.nodes)) / neighbourhood["counts"]
+
+    def weightedMeanFilter(self, values, radius):
+        # GraphX.weightedMeanFilter weighs the value of the centre node itself by 1 / (1 + hop distance)
+        neighbourhood = self.getNeighbourhood(radius)
+        weights = np.bincount(neighbourhood["owners"], weights=1.0 / (1 + neighbourhood["distances"]), minlength=len(self.nodes))
+        return values * weights / neighbourhood["counts"]
+
+    def medianFilter(self, values, radius):
+        # rounded up median of every neighbourhood, from one sort of all neighbourhood values grouped by owner
+        neighbourhood = self.getNeighbourhood(radius)
+        starts, counts = neighbourhood["offsets"][:-1], neighbourhood["counts"]
+        if ((values == 0) | (values == 1)).all():
+            # 0/1 masks need no sort, the ones of a neighbourhood fill the top of its sorted values
+            ones = np.add.reduceat(values[..., neighbourhood["neighbours"]], starts, axis=-1)
+            return np.ceil((((counts - 1) // 2 >= counts - ones).astype(np.float64) + (counts // 2 >= counts - ones)) / 2)
+        neighbourValues = values[..., neighbourhood["neighbours"]]
+        owners = np.broadcast_to(neighbourhood["owners"], neighbourValues.shape)
+        sortedValues = np.take_along_axis(neighbourValues, np.lexsort((neighbourValues, owners), axis=-1), axis=-1)
+        return np.ceil((sortedValues[..., starts + (counts - 1) // 2] + sortedValues[..., starts + counts // 2]) / 2)
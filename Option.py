@@ -1,11 +1,20 @@
 
 class Option:
 
-    def __init__(self, optionType, coordinates, QValue=0.0):
+    def __init__(self, optionType, coordinates, QValue=0.0, gridSize=None):
         if optionType in ["L", "U", "R", "D"] or len(optionType.split("_")) == 2:
             self.optionType = optionType
             self.coordinates = coordinates
             self.QValue = QValue
+
+            # integer ids used with Environment.transitionTable, resolved once instead of on every step
+            self.actionIndex = ["L", "U", "R", "D"].index(optionType) if optionType in ["L", "U", "R", "D"] else None
+            self.sourceState = self.destinationState = None
+            if gridSize is not None:
+                self.sourceState = coordinates[0] * gridSize[1] + coordinates[1]
+                if self.actionIndex is None:
+                    destinationRow, destinationCol = optionType.split("_")
+                    self.destinationState = int(destinationRow) * gridSize[1] + int(destinationCol)
         else:
             print("UNKNOWN TYPE")
 
@@ -1,44 +1,174 @@
-import heapq
-
-
 class PQueue:
+    """
+    Indexed binary max-heap. Every item is stored at most once and its heap position is kept in a dictionary,
+    so updating the priority of an item already in the queue costs O(log n) instead of a linear scan.
+    """
+
     def __init__(self):
-        self._queue = []
+        self._heap = []
+        self._priorities = []
+        self._positions = {}
 
     def push(self, item, priority):
-        if not self.ifExists(item):
-            heapq.heappush(self._queue, (-priority, item))
-        else:
-            if self.deleteWorse(item, priority):
-                heapq.heappush(self._queue, (-priority, item))
+        # insert the item or raise its priority (update-if-better)
+        position = self._positions.get(item)
+        if position is None:
+            self._heap.append(item)
+            self._priorities.append(priority)
+            self._positions[item] = len(self._heap) - 1
+            self._siftUp(len(self._heap) - 1)
+        elif priority > self._priorities[position]:
+            self._priorities[position] = priority
+            self._siftUp(position)
 
     def pop(self):
-        return heapq.heappop(self._queue)[-1]
+        return self.popWithPriority()[0]
+
+    def popWithPriority(self):
+        heap = self._heap
+        priorities = self._priorities
+        item = heap[0]
+        priority = priorities[0]
+        lastItem = heap.pop()
+        lastPriority = priorities.pop()
+        del self._positions[item]
+        if heap:
+            heap[0] = lastItem
+            priorities[0] = lastPriority
+            self._positions[lastItem] = 0
+            self._siftDown(0)
+        return item, priority
+
+    def popMany(self, numOfItems):
+        # the numOfItems best items (fewer if the queue runs out) with their priorities, best first
+        items = []
+        priorities = []
+        while self._heap and len(items) < numOfItems:
+            item, priority = self.popWithPriority()
+            items.append(item)
+            priorities.append(priority)
+        return items, priorities
+
+    def pushMany(self, items, priorities):
+        # bulk push with update-if-better semantics; many new items are appended and heapified in one O(n) pass
+        if len(items) * 4 < len(self._heap):
+            for item, priority in zip(items, priorities):
+                self.push(item, priority)
+            return
+        heap = self._heap
+        queuedPriorities = self._priorities
+        positions = self._positions
+        for item, priority in zip(items, priorities):
+            position = positions.get(item)
+            if position is None:
+                positions[item] = len(heap)
+                heap.append(item)
+                queuedPriorities.append(priority)
+            elif priority > queuedPriorities[position]:
+                queuedPriorities[position] = priority
+        for position in reversed(range(len(heap) // 2)):
+            self._siftDown(position)
+
+    def getHeap(self):
+        # (items, priorities) in heap order, restoreHeap puts them back as they were
+        return list(self._heap), list(self._priorities)
+
+    def restoreHeap(self, items, priorities):
+        self._heap = list(items)
+        self._priorities = list(priorities)
+        self._positions = {item: position for position, item in enumerate(self._heap)}
+
+    def peek(self):
+        return self._heap[0]
 
     def ifExists(self, item):
-        return any(entry[1] == item for entry in self._queue)
+        return item in self._positions
+
+    def getPriority(self, item):
+        return self._priorities[self._positions[item]]
 
     def deleteWorse(self, item, priority):
-        if self.ifExists(item):
-            worseList = [i for i, entry in enumerate(self._queue) if item == entry[1] and -priority < entry[0]]
-            if len(worseList) > 0:
-                del self._queue[worseList[0]]
-                heapq.heapify(self._queue)
-                return True
+        # remove the item if its queued priority is worse than the given one
+        position = self._positions.get(item)
+        if position is not None and priority > self._priorities[position]:
+            self._remove(position)
+            return True
         return False
 
     def clear(self):
-        self._queue.clear()
+        self._heap.clear()
+        self._priorities.clear()
+        self._positions.clear()
 
     def print(self):
-        for i in range(len(self._queue)):
-            print(-self._queue[i][0], self._queue[i][1].coordinates, self._queue[i][1].actionType)
+        for item, priority in zip(self._heap, self._priorities):
+            print(priority, item)
 
     def ifEmpty(self):
-        if not self._queue:
-            return True
-        else:
-            return False
+        return not self._heap
 
     def count(self):
-        return len(self._queue)
+        return len(self._heap)
+
+    def __len__(self):
+        return len(self._heap)
+
+    def __contains__(self, item):
+        return item in self._positions
+
+    def _remove(self, position):
+        heap = self._heap
+        priorities = self._priorities
+        del self._positions[heap[position]]
+        lastItem = heap.pop()
+        lastPriority = priorities.pop()
+        if position < len(heap):
+            oldPriority = priorities[position]
+            heap[position] = lastItem
+            priorities[position] = lastPriority
+            self._positions[lastItem] = position
+            if lastPriority > oldPriority:
+                self._siftUp(position)
+            else:
+                self._siftDown(position)
+
+    def _siftUp(self, position):
+        heap = self._heap
+        priorities = self._priorities
+        positions = self._positions
+        item = heap[position]
+        priority = priorities[position]
+        while position > 0:
+            parent = (position - 1) >> 1
+            if priorities[parent] >= priority:
+                break
+            heap[position] = heap[parent]
+            priorities[position] = priorities[parent]
+            positions[heap[position]] = position
+            position = parent
+        heap[position] = item
+        priorities[position] = priority
+        positions[item] = position
+
+    def _siftDown(self, position):
+        heap = self._heap
+        priorities = self._priorities
+        positions = self._positions
+        size = len(heap)
+        item = heap[position]
+        priority = priorities[position]
+        while True:
+            child = 2 * position + 1
+            if child >= size:
+                break
+            if child + 1 < size and priorities[child + 1] > priorities[child]:
+                child += 1
+            if priorities[child] <= priority:
+                break
+            heap[position] = heap[child]
+            priorities[position] = priorities[child]
+            positions[heap[position]] = position
+            position = child
+        heap[position] = item
+        priorities[position] = priority
+        positions[item] = position
@@ -0,0 +1,156 @@
+import multiprocessing
+import os
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from GridGraph import accumulateBetweenness
+
+
+class CentralityPool:
+    """
+    Process pool for the centrality sums that split over BFS sources. The CSR arrays of a graph are copied once per
+    call into shared memory and read in place by the workers, only the source chunks are pickled, and the partial
+    vectors of the chunks are added up here. The workers start with the pool, create it before starting threads.
+    """
+
+    def __init__(self, processes=None, chunksPerProcess=4):
+        self.processes = max(1, int(processes or os.cpu_count()))
+        self.chunksPerProcess = chunksPerProcess
+        # workers forked before the resource tracker runs start their own and report the blocks as leaked
+        resource_tracker.ensure_running()
+        self.pool = multiprocessing.Pool(self.processes)
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+    def map(self, task, arrays, sources, *arguments):
+        # task(arrays, sourcesChunk, *argumentsChunk) in the workers, arguments are split along with the sources
+        blocks, specs = [], []
+        try:
+            for array in arrays:
+                array = np.ascontiguousarray(array)
+                block = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+                blocks.append(block)
+                np.ndarray(array.shape, array.dtype, buffer=block.buf)[...] = array
+                specs.append((block.name, array.shape, array.dtype.str))
+            numOfChunks = max(1, min(len(sources), self.processes * self.chunksPerProcess))
+            chunks = np.array_split(np.arange(len(sources)), numOfChunks)
+            jobs = [(task, specs, [sources[position] for position in chunk], [[argument[position] for position in chunk] for argument in arguments]) for chunk in chunks]
+            return self.pool.map(runJob, jobs)
+        finally:
+            for block in blocks:
+                block.close()
+                block.unlink()
+
+    def betweenness(self, offsets, neighbours, sources, weights):
+        # accumulateBetweenness of the CSR graph, summed over chunks of the sources
+        return sum(self.map(betweennessTask, [offsets, neighbours], np.asarray(sources).tolist(), np.asarray(weights).tolist()))
+
+    def countPathOccurrences(self, offsets, neighbours, sources=None, subgoals=(), weights=None):
+        # countTreeOccurrences summed over chunks of the sources
+        sources = list(range(len(offsets) - 1)) if sources is None else list(sources)
+        weights = [1] * len(sources) if weights is None else list(weights)
+        subgoals = np.asarray(subgoals, dtype=np.int64).reshape(-1)
+        results = self.map(pathOccurrencesTask, [offsets, neighbours, subgoals], sources, weights)
+        occurrences = sum(result[0] for result in results)
+        numberOfShortestPaths = sum(result[1] for result in results)
+        subgoalOccurrences = sum(result[2] for result in results)
+        return occurrences, numberOfShortestPaths, subgoalOccurrences
+
+
+def runJob(job):
+    # attaches to the shared arrays for one chunk, the views are dropped before the blocks are closed
+    task, specs, sources, arguments = job
+    blocks = [shared_memory.SharedMemory(name=name) for name, shape, dtype in specs]
+    try:
+        arrays = [np.ndarray(shape, dtype, buffer=block.buf) for block, (name, shape, dtype) in zip(blocks, specs)]
+        result = task(arrays, sources, *arguments)
+        del arrays
+        return result
+    finally:
+        for block in blocks:
+            block.close()
+
+
+def betweennessTask(arrays, sources, weights):
+    offsets, neighbours = arrays
+    return accumulateBetweenness(offsets, neighbours, np.array(sources, dtype=np.int64), np.array(weights))
+
+
+def pathOccurrencesTask(arrays, sources, weights):
+    offsets, neighbours, subgoals = arrays
+    return countTreeOccurrences(offsets, neighbours, sources, subgoals, weights)
+
+
+def countTreeOccurrences(offsets, neighbours, sources, subgoals=(), weights=None):
+    """
+    Shortest path occurrences of every node of the CSR graph from the BFS trees of the sources, as in
+    GraphXv2.shortestPathTree, each tree counted weight times. A node lies on the paths from the source to every
+    node of its subtree. Through a subgoal, the nodes above it lie on the paths to its subtree and the nodes below
+    it on the paths to their own subtrees, which preorder numbers turn into interval tests over all subgoals at
+    once. Returns the occurrences, the number of paths and a (subgoals, nodes) array.
+    """
+    numOfNodes = len(offsets) - 1
+    neighbours = np.asarray(neighbours).tolist()
+    offsets = np.asarray(offsets).tolist()
+    adjacency = [neighbours[offsets[node]:offsets[node + 1]] for node in range(numOfNodes)]
+    subgoals = np.asarray(subgoals, dtype=np.int64).reshape(-1)
+    weights = [1] * len(sources) if weights is None else list(weights)
+    occurrences = [0] * numOfNodes
+    subgoalOccurrences = np.zeros((len(subgoals), numOfNodes), dtype=np.asarray(weights + [1]).dtype)
+    numberOfShortestPaths = 0
+    for source, weight in zip(sources, weights):
+        parents, order, subtreeSizes = shortestPathTree(adjacency, source)
+        numberOfShortestPaths += len(order)
+        for node in order:
+            occurrences[node] += weight * subtreeSizes[node]
+        if len(subgoals):
+            numbers = np.array(preorderNumbers(parents, order, subtreeSizes))
+            sizes = np.array(subtreeSizes)
+            # a subgoal outside the tree is numbered -1 with size 0 and matches no node
+            first = numbers[subgoals][:, None]
+            subgoalSizes = sizes[subgoals][:, None]
+            below = (numbers > first) & (numbers < first + subgoalSizes)
+            above = (numbers >= 0) & (numbers < first) & (first < numbers + sizes)
+            subgoalOccurrences += weight * (above * subgoalSizes + below * sizes)
+    return np.array(occurrences), numberOfShortestPaths, subgoalOccurrences
+
+
+def shortestPathTree(adjacency, source):
+    # GraphXv2.shortestPathTree on node positions: parents are -1 for the source and -2 outside its component
+    parents = [-2] * len(adjacency)
+    parents[source] = -1
+    order = [source]
+    for node in order:
+        for neighbour in adjacency[node]:
+            if parents[neighbour] == -2:
+                parents[neighbour] = node
+                order.append(neighbour)
+    subtreeSizes = [0] * len(adjacency)
+    for node in order:
+        subtreeSizes[node] = 1
+    for node in reversed(order[1:]):
+        subtreeSizes[parents[node]] += subtreeSizes[node]
+    return parents, order, subtreeSizes
+
+
+def preorderNumbers(parents, order, subtreeSizes):
+    # numbers of a depth first walk of the tree, -1 outside it: the descendants of a node follow it in a block of
+    # subtree size - 1 numbers, the children taking their blocks in BFS order
+    numbers = [-1] * len(parents)
+    nextNumbers = [0] * len(parents)
+    numbers[order[0]], nextNumbers[order[0]] = 0, 1
+    for node in order[1:]:
+        parent = parents[node]
+        numbers[node] = nextNumbers[parent]
+        nextNumbers[parent] += subtreeSizes[node]
+        nextNumbers[node] = numbers[node] + 1
+    return numbers
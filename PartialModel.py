@@ -0,0 +1,39 @@
+class PartialModel:
+    """
+    Partial model of prioritized sweeping stored as a reverse adjacency index. For every successor state id it keeps
+    each observed (predecessor state id, option type) pair with the reward of the transition, so a sweep enumerates
+    the predecessors of a state in O(in-degree). Per state tables are created on the first observation only, and
+    maxPredecessorsPerState (if set) drops the oldest pair of a state when a new one does not fit.
+    """
+
+    def __init__(self, numOfStates, maxPredecessorsPerState=None):
+        self.numOfStates = numOfStates
+        self.maxPredecessorsPerState = maxPredecessorsPerState
+        self.clear()
+
+    def clear(self):
+        self.predecessors = [None] * self.numOfStates
+        self.numOfEntries = 0
+
+    def insert(self, predecessorState, optionType, successorState, reward):
+        entries = self.predecessors[successorState]
+        if entries is None:
+            entries = self.predecessors[successorState] = {}
+        key = (predecessorState, optionType)
+        if key not in entries:
+            if self.maxPredecessorsPerState is not None and len(entries) >= self.maxPredecessorsPerState:
+                del entries[next(iter(entries))]
+                self.numOfEntries -= 1
+            self.numOfEntries += 1
+        entries[key] = reward
+
+    def getPredecessors(self, successorState):
+        # ((predecessor state, option type), reward) pairs observed to lead to successorState
+        entries = self.predecessors[successorState]
+        return entries.items() if entries is not None else ()
+
+    def __contains__(self, successorState):
+        return self.predecessors[successorState] is not None
+
+    def __len__(self):
+        return self.numOfEntries
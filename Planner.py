@@ -0,0 +1,125 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import sys
+import time
+
+import numpy as np
+
+
+def reverseAdjacency(transitionTable):
+    # predecessors of state s are predecessors[offsets[s]:offsets[s + 1]]
+    numOfStates, numOfActions = transitionTable.shape
+    sources = np.repeat(np.arange(numOfStates, dtype=np.int64), numOfActions)
+    destinations = transitionTable.ravel()
+    valid = destinations >= 0
+    sources, destinations = sources[valid], destinations[valid]
+    predecessors = sources[np.argsort(destinations, kind="stable")]
+    offsets = np.zeros(numOfStates + 1, dtype=np.int64)
+    np.cumsum(np.bincount(destinations, minlength=numOfStates), out=offsets[1:])
+    return offsets, predecessors
+
+
+def shortestPathLengths(transitionTable, goalState, minVectorizedFrontier=64):
+    """
+    Number of actions on a shortest path from every state to the goal, -1 where the goal cannot be reached.
+    Level synchronous BFS backwards from the goal over the transition table. Wide levels are expanded with array
+    operations, narrow ones (corridors, doorways) in plain Python where the per-call overhead of NumPy dominates.
+    """
+    offsets, predecessors = reverseAdjacency(transitionTable)
+    offsetList, predecessorList = offsets.tolist(), predecessors.tolist()
+    distances = np.full(len(transitionTable), -1, dtype=np.int64)
+    distances[goalState] = 0
+    frontier = [goalState]
+    distance = 0
+    while len(frontier):
+        distance += 1
+        if len(frontier) < minVectorizedFrontier:
+            nextFrontier = []
+            for state in frontier:
+                for predecessor in predecessorList[offsetList[state]:offsetList[state + 1]]:
+                    if distances[predecessor] < 0:
+                        distances[predecessor] = distance
+                        nextFrontier.append(predecessor)
+            frontier = nextFrontier
+            continue
+        frontier = np.asarray(frontier, dtype=np.int64)
+        starts = offsets[frontier]
+        counts = offsets[frontier + 1] - starts
+        positions = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        candidates = predecessors[positions]
+        frontier = np.unique(candidates[distances[candidates] < 0])
+        distances[frontier] = distance
+    return distances
+
+
+def optimalValues(distances, discountFactor, immRewardAtGoal):
+    # max-Q of every state under the reward scheme of the trainers: a state d actions away from the goal is worth
+    # discountFactor^(d - 1) * (1 + discountFactor) * immRewardAtGoal, the goal and unreachable states are worth 0
+    values = np.zeros(len(distances))
+    reachable = distances > 0
+    values[reachable] = discountFactor ** (distances[reachable] - 1) * (1 + discountFactor) * immRewardAtGoal
+    return values
+
+
+def optimalQValues(transitionTable, distances, goalState, discountFactor, immRewardAtGoal):
+    # (states, actions) optimal Q-values, -inf for actions heading walls
+    values = optimalValues(distances, discountFactor, immRewardAtGoal)
+    valid = transitionTable >= 0
+    nextStates = np.where(valid, transitionTable, 0)
+    QValues = np.where(nextStates == goalState, (1 + discountFactor) * immRewardAtGoal, discountFactor * values[nextStates])
+    QValues[~valid] = -np.inf
+    return QValues
+
+
+def valueIteration(transitionTable, goalState, discountFactor, immRewardAtGoal, tolerance=1e-9, maxNumOfIterations=100000):
+    """
+    Synchronous Bellman backups of the max-Q of every state with the TD target of the trainers,
+    imm(s') + discountFactor * (maxQ(s') + imm(s')). The goal ends the episode so its own max-Q stays 0.
+    Needs as many sweeps as the longest shortest path, shortestPathLengths with optimalValues is the fast route.
+    """
+    numOfStates = len(transitionTable)
+    valid = transitionTable >= 0
+    nextStates = np.where(valid, transitionTable, goalState)
+    hasActions = valid.any(axis=1)
+    immRewards = np.zeros(numOfStates)
+    immRewards[goalState] = immRewardAtGoal
+    nextImmRewards = immRewards[nextStates]
+    values = np.zeros(numOfStates)
+    for numOfIterations in range(1, maxNumOfIterations + 1):
+        QValues = np.where(valid, nextImmRewards + discountFactor * (values[nextStates] + nextImmRewards), -np.inf)
+        newValues = np.where(hasActions, QValues.max(axis=1), 0.0)
+        newValues[goalState] = 0.0
+        change = np.abs(newValues - values).max()
+        values = newValues
+        if change <= tolerance:
+            break
+    return values, numOfIterations
+
+
+def isGreedyPathOptimal(policy, transitionTable, startState, distances):
+    # the greedy policy (action index per state) walks from the start to the goal in the optimal number of actions
+    state = startState
+    for step in range(distances[startState]):
+        action = policy[state]
+        if action < 0:
+            return False
+        nextState = transitionTable.item(state, action)
+        if nextState < 0 or distances[nextState] != distances[state] - 1:
+            return False
+        state = nextState
+    return bool(distances[startState] >= 0)
+
+
+def main():
+    from Environment import loadEnvironment
+
+    mapFile = sys.argv[1] if len(sys.argv) > 1 else "mapFiles/halls.gwmap"
+    environment = loadEnvironment(mapFile)
+    startTime = time.perf_counter()
+    distances = shortestPathLengths(environment.transitionTable, environment.getStateId(environment.goalCoordinates))
+    print("%s: optimal path has %d actions, %d of %d states reach the goal (%.3f s)" % (mapFile, distances[environment.getStateId(environment.startCoordinates)], (distances >= 0).sum(), len(distances), time.perf_counter() - startTime))
+
+
+if __name__ == "__main__":
+    main()
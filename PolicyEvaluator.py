@@ -0,0 +1,45 @@
+import numpy as np
+
+from Planner import shortestPathLengths
+
+
+def greedyPolicy(QValues, numOfActions=4):
+    # greedy action index of every state with ties going to the first action as in State.getBestOption,
+    # -1 where no action is valid
+    QValues = np.asarray(QValues).reshape(-1, numOfActions)
+    policy = QValues.argmax(axis=1)
+    policy[~np.isfinite(QValues).any(axis=1)] = -1
+    return policy
+
+
+def policyTransitions(policy, transitionTable, goalState):
+    # the state every state moves to under the policy, -1 for walls, states without actions and the goal
+    states = np.flatnonzero(policy >= 0)
+    nextStates = np.full(len(policy), -1, dtype=np.int64)
+    nextStates[states] = transitionTable[states, policy[states]]
+    nextStates[goalState] = -1
+    return nextStates
+
+
+def greedyPathLengths(policy, transitionTable, goalState):
+    """
+    Number of actions the policy takes from every state to the goal, -1 where it runs into a wall or a cycle.
+    A deterministic policy makes every state point at one successor, so a backwards BFS from the goal over these
+    pointers reaches exactly the states whose rollout ends at the goal and cycles never have to be walked.
+    """
+    return shortestPathLengths(policyTransitions(policy, transitionTable, goalState)[:, None], goalState)
+
+
+def evaluateGreedyPolicy(QValues, transitionTable, goalState, startStates, optimalDistances=None):
+    # rollouts of the greedy policy from the given start states
+    startStates = np.atleast_1d(startStates)
+    pathLengths = greedyPathLengths(greedyPolicy(QValues, transitionTable.shape[1]), transitionTable, goalState)[startStates]
+    succeeded = pathLengths >= 0
+    results = {
+        "pathLengths": pathLengths,
+        "successRate": float(succeeded.mean()),
+        "meanPathLength": float(pathLengths[succeeded].mean()) if succeeded.any() else float("inf"),
+    }
+    if optimalDistances is not None:
+        results["optimalRate"] = float((succeeded & (pathLengths == optimalDistances[startStates])).mean())
+    return results
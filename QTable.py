@@ -0,0 +1,129 @@
+import random
+
+import numpy as np
+
+# action order of every array based component, same order as the bits of the hex wall codes
+ACTIONS = ["L", "U", "R", "D"]
+ACTION_OFFSETS = [(0, -1), (-1, 0), (0, 1), (1, 0)]
+WALL_BITS = [8, 4, 2, 1]
+
+
+def wallCodesFromMapMatrix(mapMatrix):
+    # hex wall codes ("0".."F") as an integer matrix
+    mapMatrix = np.asarray(mapMatrix)
+    return np.array([int(digit, 16) for digit in mapMatrix.ravel()], dtype=np.int64).reshape(mapMatrix.shape)
+
+
+def validActionsFromMapMatrix(mapMatrix):
+    # validActions[row, col, action] is True when there is no wall in that direction
+    wallCodes = wallCodesFromMapMatrix(mapMatrix)
+    return np.stack([(wallCodes & bit) == 0 for bit in WALL_BITS], axis=-1)
+
+
+class QTable:
+    """
+    Array backend for the "mu" policy: the Q-values of the four micro options of every state are kept in one
+    float64 array shaped (rows, cols, actions). Actions heading a wall hold -inf so that greedy selection and
+    max-Q are plain argmax/max calls; validActions keeps the mask derived from the hex wall codes.
+    """
+
+    def __init__(self, mapMatrix, goalCoordinates, immRewardAtGoal=50):
+        self.gridSize = tuple(np.shape(mapMatrix))
+        self.numOfStates = self.gridSize[0] * self.gridSize[1]
+        self.validActions = validActionsFromMapMatrix(mapMatrix)
+        self.immRewards = np.zeros(self.gridSize, dtype=np.float64)
+        self.goalCoordinates = tuple(goalCoordinates)
+        self.immRewards[self.goalCoordinates] = immRewardAtGoal
+        self.QValues = np.empty(self.gridSize + (len(ACTIONS),), dtype=np.float64)
+        self.reset()
+
+    def reset(self):
+        self.QValues[:] = 0.0
+        self.QValues[~self.validActions] = -np.inf
+        self.updateValidActionLists()
+
+    def updateValidActionLists(self):
+        # per state lists of valid action indices, used by the exploratory choice in the hot loop
+        flatValidActions = self.validActions.reshape(self.numOfStates, len(ACTIONS))
+        self.validActionLists = [np.flatnonzero(flatValidActions[stateId]).tolist() for stateId in range(self.numOfStates)]
+
+    def setValidActions(self, row, col, validActions):
+        # follow a wall edit: newly opened actions start from zero, blocked ones go to -inf
+        opened = validActions & ~self.validActions[row, col]
+        self.validActions[row, col] = validActions
+        self.QValues[row, col][opened] = 0.0
+        self.QValues[row, col][~validActions] = -np.inf
+        self.validActionLists[row * self.gridSize[1] + col] = np.flatnonzero(validActions).tolist()
+
+    def getFlatQValues(self):
+        # (states, actions) view sharing memory with QValues, state id is row * cols + col
+        return self.QValues.reshape(self.numOfStates, len(ACTIONS))
+
+    def getFlatImmRewards(self):
+        return self.immRewards.reshape(self.numOfStates)
+
+    def getBestAction(self, stateId):
+        return int(self.getFlatQValues()[stateId].argmax())
+
+    def getMaxQValue(self, stateId):
+        # same definition as State.getMaxQValue: best Q-value plus the immediate reward of the state
+        if not self.validActionLists[stateId]:
+            return self.getFlatImmRewards()[stateId]
+        return self.getFlatQValues()[stateId].max() + self.getFlatImmRewards()[stateId]
+
+    def getOption(self, stateId, epsilon, randomStream=None):
+        # same rule as State.getOption: explore while the best Q-value is still zero or with probability epsilon
+        row = self.getFlatQValues()[stateId]
+        bestAction = int(row.argmax())
+        if randomStream is not None:
+            if row[bestAction] == 0 or randomStream.uniform() <= epsilon:
+                return randomStream.choice(self.validActionLists[stateId])
+        elif row[bestAction] == 0 or random.uniform(0, 1) <= epsilon:
+            return random.choice(self.validActionLists[stateId])
+        return bestAction
+
+    def getMaxQValues(self):
+        hasActions = self.validActions.any(axis=-1)
+        return np.where(hasActions, self.QValues.max(axis=-1, initial=-np.inf), 0.0) + self.immRewards
+
+    def getGreedyPolicy(self):
+        # greedy action index of every state, -1 where no action is valid
+        policy = self.QValues.argmax(axis=-1)
+        policy[~self.validActions.any(axis=-1)] = -1
+        return policy
+
+    def exportToStateList(self, stateList):
+        # write the Q-values back to the micro options so that MainUI.showMaxOptionsOnGrid can render them
+        for row in range(self.gridSize[0]):
+            for col in range(self.gridSize[1]):
+                options = stateList[row][col].policies["mu"]
+                for action, optionType in enumerate(ACTIONS):
+                    if optionType in options and self.validActions[row, col, action]:
+                        options[optionType].QValue = float(self.QValues[row, col, action])
+
+    def linkStateList(self, stateList):
+        # remembers the micro options behind every valid Q-value, refreshFromLinkedOptions then copies their values
+        # without walking the states again, valid while the states keep their micro options
+        self.reset()
+        self.linkedStateList = stateList
+        self.linkedPositions, self.linkedOptions = [], []
+        for row in range(self.gridSize[0]):
+            for col in range(self.gridSize[1]):
+                options = stateList[row][col].policies["mu"]
+                for action, optionType in enumerate(ACTIONS):
+                    if optionType in options and self.validActions[row, col, action]:
+                        self.linkedPositions.append((row * self.gridSize[1] + col) * len(ACTIONS) + action)
+                        self.linkedOptions.append(options[optionType])
+        self.refreshFromLinkedOptions()
+
+    def refreshFromLinkedOptions(self):
+        self.QValues.reshape(-1)[self.linkedPositions] = [option.QValue for option in self.linkedOptions]
+
+    def importFromStateList(self, stateList):
+        self.reset()
+        for row in range(self.gridSize[0]):
+            for col in range(self.gridSize[1]):
+                options = stateList[row][col].policies["mu"]
+                for action, optionType in enumerate(ACTIONS):
+                    if optionType in options and self.validActions[row, col, action]:
+                        self.QValues[row, col, action] = options[optionType].QValue
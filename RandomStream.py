@@ -0,0 +1,46 @@
+import json
+
+import numpy as np
+
+
+class RandomStream:
+    """
+    Seeded source of the exploration randomness of one training run. Uniforms are drawn from a NumPy Generator in
+    blocks of blockSize and handed out one by one, random choices use the same uniforms, so a run is reproduced
+    exactly by its seed. Without a seed a fresh one is taken from the OS and kept in seed to be reported.
+    """
+
+    def __init__(self, seed=None, blockSize=1 << 14):
+        self.seed = int(np.random.SeedSequence().entropy) if seed is None else int(seed)
+        self.generator = np.random.default_rng(self.seed)
+        self.blockSize = blockSize
+        self.refill()
+
+    def refill(self):
+        self.blockState = self.generator.bit_generator.state
+        self.block = self.generator.random(self.blockSize).tolist()
+        self.position = 0
+
+    def getState(self):
+        # JSON text of the generator state before the current block and the position in it, for checkpoints
+        return json.dumps({"blockState": self.blockState, "position": self.position})
+
+    def setState(self, state):
+        state = json.loads(state)
+        self.generator.bit_generator.state = state["blockState"]
+        self.refill()
+        self.position = state["position"]
+
+    def uniform(self):
+        # uniform in [0, 1)
+        if self.position == self.blockSize:
+            self.refill()
+        value = self.block[self.position]
+        self.position += 1
+        return value
+
+    def index(self, numOfItems):
+        return int(self.uniform() * numOfItems)
+
+    def choice(self, sequence):
+        return sequence[int(self.uniform() * len(sequence))]
@@ -0,0 +1,165 @@
+import json
+import os
+import struct
+
+import numpy as np
+
+# indexed binary container: fixed header, JSON metadata, uint8 action codes, uint64 episode end offsets
+SEQUENCE_MAGIC = b"GWSEQ001"
+SEQUENCE_HEADER = struct.Struct("<8sIQQQ")
+SEQUENCE_FORMATS = ["text", "binary", "indexed"]
+
+
+def alignTo8(offset):
+    return (offset + 7) & ~7
+
+
+class SequenceWriter:
+    """
+    Streams the action sequence of a training run to a file. Actions are collected in a byte buffer that is written
+    out whenever it reaches bufferSize bytes, so memory stays bounded however long training runs. The "text" format
+    is the original one code per line, "binary" stores every action code as a single byte, and "indexed" is the
+    binary stream inside a container with a header and an episode index that SequenceReader memory-maps.
+    """
+
+    def __init__(self, fileName, actionCodes, sequenceFormat="text", bufferSize=1 << 16, append=True, mapName="", actions=None):
+        if sequenceFormat not in SEQUENCE_FORMATS:
+            raise ValueError("Unknown sequence format: %s" % sequenceFormat)
+        folder = os.path.dirname(fileName)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+        self.fileName = fileName
+        self.sequenceFormat = sequenceFormat
+        self.bufferSize = bufferSize
+        self.buffer = bytearray()
+        self.numOfActions = 0
+        self.episodeEnds = []
+
+        # bytes written for every action index
+        if sequenceFormat == "text":
+            self.encodedActions = [("%s\n" % code).encode("ascii") for code in actionCodes]
+        else:
+            self.encodedActions = [bytes([int(code)]) for code in actionCodes]
+
+        if sequenceFormat == "indexed":
+            self.openContainer(append, mapName, actions, actionCodes)
+        else:
+            self.sequenceFile = open(fileName, "ab" if append else "wb")
+
+    def openContainer(self, append, mapName, actions, actionCodes):
+        # an existing container is continued: its index is read back and the new actions overwrite it
+        if append and os.path.isfile(self.fileName) and os.path.getsize(self.fileName) > 0:
+            self.sequenceFile = open(self.fileName, "r+b")
+            metadataLength, numOfActions, numOfEpisodes, indexOffset = readSequenceHeader(self.sequenceFile)
+            self.dataOffset = alignTo8(SEQUENCE_HEADER.size + metadataLength)
+            self.sequenceFile.seek(indexOffset)
+            self.episodeEnds = np.frombuffer(self.sequenceFile.read(8 * numOfEpisodes), dtype="<u8").tolist()
+            self.numOfActions = numOfActions
+            self.sequenceFile.seek(self.dataOffset + numOfActions)
+            self.sequenceFile.truncate()
+            return
+
+        metadata = json.dumps({"mapName": mapName, "actions": list(actions or []), "codes": [int(code) for code in actionCodes]}).encode("utf-8")
+        self.dataOffset = alignTo8(SEQUENCE_HEADER.size + len(metadata))
+        self.sequenceFile = open(self.fileName, "wb")
+        self.sequenceFile.write(SEQUENCE_HEADER.pack(SEQUENCE_MAGIC, len(metadata), 0, 0, 0))
+        self.sequenceFile.write(metadata.ljust(self.dataOffset - SEQUENCE_HEADER.size, b" "))
+
+    def write(self, actionIndex):
+        self.buffer += self.encodedActions[actionIndex]
+        self.numOfActions += 1
+        if len(self.buffer) >= self.bufferSize:
+            self.flush()
+
+    def endEpisode(self):
+        # episode boundaries are kept by the indexed format only, 8 bytes per episode
+        if self.sequenceFormat == "indexed":
+            self.episodeEnds.append(self.numOfActions)
+
+    def flush(self):
+        if self.buffer:
+            self.sequenceFile.write(self.buffer)
+            self.buffer.clear()
+        self.sequenceFile.flush()
+
+    def close(self):
+        if self.sequenceFile.closed:
+            return
+        self.flush()
+        if self.sequenceFormat == "indexed":
+            # the index follows the actions, the header is patched to point at it
+            indexOffset = alignTo8(self.dataOffset + self.numOfActions)
+            self.sequenceFile.write(b"\0" * (indexOffset - self.dataOffset - self.numOfActions))
+            self.sequenceFile.write(np.asarray(self.episodeEnds, dtype="<u8").tobytes())
+            self.sequenceFile.seek(len(SEQUENCE_MAGIC) + 4)
+            self.sequenceFile.write(struct.pack("<QQQ", self.numOfActions, len(self.episodeEnds), indexOffset))
+        self.sequenceFile.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exceptionInfo):
+        self.close()
+
+
+def readSequenceHeader(sequenceFile):
+    magic, metadataLength, numOfActions, numOfEpisodes, indexOffset = SEQUENCE_HEADER.unpack(sequenceFile.read(SEQUENCE_HEADER.size))
+    if magic != SEQUENCE_MAGIC:
+        raise ValueError("%s is not an indexed action sequence file." % sequenceFile.name)
+    return metadataLength, numOfActions, numOfEpisodes, indexOffset
+
+
+class SequenceReader:
+    """
+    Random access to an indexed action sequence file. The action codes and the episode index are memory-mapped,
+    getEpisode returns a uint8 view into the mapping, so single episodes of a large run are read without loading it.
+    """
+
+    def __init__(self, fileName):
+        self.fileName = fileName
+        with open(fileName, "rb") as sequenceFile:
+            metadataLength, self.numOfActions, self.numOfEpisodes, indexOffset = readSequenceHeader(sequenceFile)
+            metadata = json.loads(sequenceFile.read(metadataLength).decode("utf-8"))
+        self.mapName = metadata["mapName"]
+        self.actions = metadata["actions"]
+        self.codes = metadata["codes"]
+
+        dataOffset = alignTo8(SEQUENCE_HEADER.size + metadataLength)
+        self.actionCodes = np.memmap(fileName, dtype=np.uint8, mode="r", offset=dataOffset, shape=(self.numOfActions,)) if self.numOfActions else np.empty(0, dtype=np.uint8)
+        self.episodeEnds = np.memmap(fileName, dtype="<u8", mode="r", offset=indexOffset, shape=(self.numOfEpisodes,)) if self.numOfEpisodes else np.empty(0, dtype="<u8")
+
+    def getEpisodeBounds(self, episode):
+        if episode < 0:
+            episode += self.numOfEpisodes
+        if not 0 <= episode < self.numOfEpisodes:
+            raise IndexError("episode %d out of range" % episode)
+        start = int(self.episodeEnds[episode - 1]) if episode > 0 else 0
+        return start, int(self.episodeEnds[episode])
+
+    def getEpisode(self, episode):
+        start, end = self.getEpisodeBounds(episode)
+        return self.actionCodes[start:end]
+
+    def getEpisodeLengths(self):
+        return np.diff(np.asarray(self.episodeEnds, dtype=np.int64), prepend=0)
+
+    def __len__(self):
+        return self.numOfEpisodes
+
+    def __getitem__(self, episode):
+        return self.getEpisode(episode)
+
+    def __iter__(self):
+        for episode in range(self.numOfEpisodes):
+            yield self.getEpisode(episode)
+
+
+def readSequenceFile(fileName, sequenceFormat="text"):
+    # action codes of a sequence file as a list of ints
+    if sequenceFormat == "text":
+        with open(fileName, "r") as sequenceFile:
+            return [int(line) for line in sequenceFile if line.strip()]
+    if sequenceFormat == "indexed":
+        return SequenceReader(fileName).actionCodes.tolist()
+    with open(fileName, "rb") as sequenceFile:
+        return list(sequenceFile.read())
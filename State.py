@@ -1,4 +1,5 @@
 import random
+from itertools import islice
 
 from Option import Option
 
@@ -13,8 +14,6 @@ class State:
         self.gridSize = gridSize
         self.immReward = 0
         self.policies = {"mu": {}}
-        self.numberOfVisits = 0
-        self.isVisitedInEpisode = False
         self.isGoal = False
 
         # generate initial action set
@@ -53,13 +52,13 @@ class State:
     def generateMicroOptions(self, policy="mu"):
         if policy in self.policies:
             if self.stateType not in ["8", "9", "A", "B", "C", "D", "E", "F"]:
-                self.policies[policy]["L"] = Option("L", self.coordinates)
+                self.policies[policy]["L"] = Option("L", self.coordinates, gridSize=self.gridSize)
             if self.stateType not in ["4", "5", "6", "7", "C", "D", "E", "F"]:
-                self.policies[policy]["U"] = Option("U", self.coordinates)
+                self.policies[policy]["U"] = Option("U", self.coordinates, gridSize=self.gridSize)
             if self.stateType not in ["2", "3", "6", "7", "A", "B", "E", "F"]:
-                self.policies[policy]["R"] = Option("R", self.coordinates)
+                self.policies[policy]["R"] = Option("R", self.coordinates, gridSize=self.gridSize)
             if self.stateType not in ["1", "3", "5", "7", "9", "B", "D", "F"]:
-                self.policies[policy]["D"] = Option("D", self.coordinates)
+                self.policies[policy]["D"] = Option("D", self.coordinates, gridSize=self.gridSize)
 
     def resetState(self):
         del self.policies
@@ -68,7 +67,7 @@ class State:
 
     def addOption(self, optionType, policy="mu", QValue=0.0):
         if optionType not in self.policies[policy]:
-            self.policies[policy][optionType] = Option(optionType, self.coordinates, QValue)
+            self.policies[policy][optionType] = Option(optionType, self.coordinates, QValue, self.gridSize)
             if optionType not in ["L", "U", "R", "D"] and optionType not in self.policies.keys():
                 self.policies[optionType] = {}
                 self.generateMicroOptions(optionType)
@@ -81,7 +80,7 @@ class State:
 
     def toggleOption(self, optionType, policy="mu"):
         if optionType not in self.policies[policy]:
-            self.policies[policy][optionType] = Option(optionType, self.coordinates)
+            self.policies[policy][optionType] = Option(optionType, self.coordinates, gridSize=self.gridSize)
             if optionType not in ["L", "U", "R", "D"] and optionType not in self.policies.keys():
                 self.policies[optionType] = {}
                 self.generateMicroOptions(optionType)
@@ -96,8 +95,14 @@ class State:
         else:
             return None
 
-    def getOption(self, epsilon, policy="mu"):
+    def getOption(self, epsilon, policy="mu", randomStream=None):
         bestOption = self.getBestOption(policy)
+        if randomStream is not None:
+            # seeded run, pick the random option by position instead of building a key list
+            options = self.policies[policy]
+            if bestOption.QValue == 0 or randomStream.uniform() <= epsilon:
+                return next(islice(options.values(), randomStream.index(len(options)), None))
+            return bestOption
         if bestOption.QValue == 0:
             return self.policies[policy][random.choice(list(self.policies[policy].keys()))]
         elif random.uniform(0, 1) <= epsilon:
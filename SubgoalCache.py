@@ -0,0 +1,105 @@
+import hashlib
+import os
+import tempfile
+import zipfile
+from collections import defaultdict
+
+import numpy as np
+
+SUBGOAL_CACHE_VERSION = 1
+
+
+def mapContent(mapMatrix):
+    # the hex codes of a map with its shape, what createMapToGraph builds its graph from
+    mapMatrix = np.asarray(mapMatrix)
+    return ("map %d %d\n" % mapMatrix.shape + "\n".join(" ".join(row) for row in mapMatrix.tolist())).encode()
+
+
+def edgeContent(edges):
+    # named edges in the order they were added, which fixes the node order the subgoal detection depends on
+    return ("edges\n" + "\n".join("%s %s" % edge for edge in edges)).encode()
+
+
+class SubgoalCache:
+    """
+    Subgoal detections on disk, one compressed .npz file per key in directory: the subgoals, their initiation sets
+    and the centrality of every node, with nodes stored as (row, col) pairs. Keys hash the content the graph was
+    built from, the goal and the detection parameters. Reading an entry touches its file, and writing one evicts the
+    least recently used files until all entries fit in maxBytes. Files are replaced atomically, so several processes
+    can share a directory.
+    """
+
+    def __init__(self, directory="outputFiles/subgoalCache", maxBytes=64 * 2 ** 20):
+        self.directory = directory
+        self.maxBytes = maxBytes
+        self.numOfHits = self.numOfMisses = 0
+
+    def makeKey(self, content, goalCoordinates, minPD, minHeight, MeanFilterWindowSize):
+        digest = hashlib.sha256(content)
+        digest.update(repr((SUBGOAL_CACHE_VERSION, tuple(int(coordinate) for coordinate in goalCoordinates), minPD, minHeight, MeanFilterWindowSize)).encode())
+        return digest.hexdigest()
+
+    def getPath(self, key):
+        return os.path.join(self.directory, key + ".npz")
+
+    def get(self, key):
+        # (subgoals, initiationSets, centrality) with node names, None when the key is not cached or unreadable
+        path = self.getPath(key)
+        try:
+            with np.load(path, allow_pickle=False) as entry:
+                if int(entry["version"]) != SUBGOAL_CACHE_VERSION:
+                    raise ValueError("Subgoal cache entry of version %d" % int(entry["version"]))
+                names = ["%d_%d" % (row, col) for row, col in entry["coordinates"].tolist()]
+                subgoals = ["%d_%d" % (row, col) for row, col in entry["subgoals"].tolist()]
+                offsets, members = entry["setOffsets"].tolist(), entry["setMembers"].tolist()
+                centrality = dict(zip(names, entry["centrality"].tolist()))
+            os.utime(path)
+        except (OSError, EOFError, KeyError, ValueError, zipfile.BadZipFile):
+            self.numOfMisses += 1
+            return None
+        self.numOfHits += 1
+        initiationSets = defaultdict(list)
+        for subgoal, start, end in zip(subgoals, offsets, offsets[1:]):
+            if end > start:
+                initiationSets[subgoal] = [names[position] for position in members[start:end]]
+        return subgoals, initiationSets, centrality
+
+    def put(self, key, subgoals, initiationSets, centrality, coordinates):
+        # coordinates maps the node names of centrality and the subgoals, the goal may not be a node yet, to (row, col)
+        names = list(centrality)
+        positions = {name: position for position, name in enumerate(names)}
+        sets = [[positions[node] for node in initiationSets.get(subgoal, [])] for subgoal in subgoals]
+        arrays = {
+            "version": np.array(SUBGOAL_CACHE_VERSION),
+            "coordinates": np.array([coordinates[name] for name in names], dtype=np.int32).reshape(-1, 2),
+            "subgoals": np.array([coordinates[subgoal] for subgoal in subgoals], dtype=np.int32).reshape(-1, 2),
+            "setOffsets": np.cumsum([0] + [len(members) for members in sets]).astype(np.int32),
+            "setMembers": np.array([position for members in sets for position in members], dtype=np.int32),
+            "centrality": np.array([centrality[name] for name in names], dtype=np.float64),
+        }
+        os.makedirs(self.directory, exist_ok=True)
+        fileDescriptor, temporaryPath = tempfile.mkstemp(suffix=".npz.tmp", dir=self.directory)
+        with os.fdopen(fileDescriptor, "wb") as temporaryFile:
+            np.savez_compressed(temporaryFile, **arrays)
+        os.replace(temporaryPath, self.getPath(key))
+        self.evict()
+
+    def evict(self):
+        # least recently read or written entries first, until the rest fit in maxBytes
+        entries = []
+        for fileName in os.listdir(self.directory):
+            if fileName.endswith(".npz"):
+                try:
+                    status = os.stat(os.path.join(self.directory, fileName))
+                except OSError:
+                    continue
+                entries.append((status.st_mtime, status.st_size, fileName))
+        totalBytes = sum(size for modified, size, fileName in entries)
+        for modified, size, fileName in sorted(entries):
+            if totalBytes <= self.maxBytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, fileName))
+            except OSError:
+                pass
+            totalBytes -= size
@@ -0,0 +1,144 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import argparse
+import csv
+import itertools
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from Environment import loadEnvironment
+from TrainingEngine import TrainingEngine
+
+# error is empty for finished runs, failed runs leave the metrics empty and keep the exception there
+RESULT_COLUMNS = ["episodes", "actions", "wallTime", "converged", "seed", "error"]
+
+
+def expandGrid(parameterGrid):
+    # {"alpha": [0.1, 0.2], "discountFactor": [0.9]} -> [{"alpha": 0.1, "discountFactor": 0.9}, {"alpha": 0.2, ...}]
+    names = sorted(parameterGrid)
+    return [dict(zip(names, values)) for values in itertools.product(*(parameterGrid[name] for name in names))]
+
+
+def setParameter(engine, name, value):
+    setter = getattr(engine, "set" + name[0].upper() + name[1:], None)
+    if setter is not None:
+        setter(value)
+    elif hasattr(engine, name):
+        setattr(engine, name, value)
+    else:
+        raise ValueError("Unknown parameter: %s" % name)
+
+
+def runKey(mapFile, algorithm, repeat, parameters):
+    # identifies a run in the results file, used to skip finished runs on resume
+    return (mapFile, algorithm, str(repeat)) + tuple("%s=%s" % (name, parameters[name]) for name in sorted(parameters))
+
+
+def runConfiguration(mapFile, algorithm, repeat, parameters, numOfEpisodes=None):
+    # runs in a worker process, only the compact metrics travel back
+    environment = loadEnvironment(mapFile)
+    engine = TrainingEngine()
+    engine.verbose = False
+    for name, value in parameters.items():
+        setParameter(engine, name, value)
+    if numOfEpisodes is not None:
+        engine.trainUntilConvergence = False
+        engine.setNumOfEpisodesForTraining(numOfEpisodes)
+    if algorithm == "ql":
+        results = engine.applyQLearning(environment)
+    else:
+        results = engine.applyPrioritizedSweeping(environment)
+    return runKey(mapFile, algorithm, repeat, parameters), (results["episodes"], results["actions"], results["wallTime"], results["converged"], results["seed"])
+
+
+def readFinishedKeys(resultsFileName, parameterNames):
+    if not os.path.isfile(resultsFileName):
+        return set()
+    finishedKeys = set()
+    with open(resultsFileName, "r", newline="") as resultsFile:
+        reader = csv.DictReader(resultsFile)
+        if reader.fieldnames and reader.fieldnames[3:len(reader.fieldnames) - len(RESULT_COLUMNS)] != parameterNames:
+            raise ValueError("%s was written for a different parameter grid." % resultsFileName)
+        for row in reader:
+            # failed runs are run again
+            if row["error"]:
+                continue
+            parameters = {name: row[name] for name in parameterNames}
+            finishedKeys.add(runKey(row["mapFile"], row["algorithm"], row["repeat"], parameters))
+    return finishedKeys
+
+
+def runSweep(parameterGrid, mapFiles, resultsFileName, algorithm="ql", numOfRepeats=1, numOfEpisodes=None, numOfWorkers=None):
+    """
+    Trains every combination of the parameter grid on every map numOfRepeats times over a process pool. Each finished
+    run is appended to the results CSV right away, so an interrupted sweep resumes by skipping the rows already there.
+    A run that raises is written as a row with its error instead of stopping the sweep, and is run again on resume.
+    Returns the number of runs started.
+    """
+    parameterNames = sorted(parameterGrid)
+    configurations = expandGrid(parameterGrid)
+    finishedKeys = readFinishedKeys(resultsFileName, parameterNames)
+
+    tasks = []
+    for mapFile, parameters, repeat in itertools.product(mapFiles, configurations, range(numOfRepeats)):
+        # compare as strings, that is how the results file stores them
+        if runKey(mapFile, algorithm, repeat, {name: str(value) for name, value in parameters.items()}) not in finishedKeys:
+            tasks.append((mapFile, algorithm, repeat, parameters))
+
+    writeHeader = not os.path.isfile(resultsFileName) or os.path.getsize(resultsFileName) == 0
+    with open(resultsFileName, "a", newline="") as resultsFile:
+        writer = csv.writer(resultsFile)
+        if writeHeader:
+            writer.writerow(["mapFile", "algorithm", "repeat"] + parameterNames + RESULT_COLUMNS)
+            resultsFile.flush()
+
+        with ProcessPoolExecutor(max_workers=numOfWorkers or os.cpu_count()) as executor:
+            futures = {executor.submit(runConfiguration, mapFile, algorithm, repeat, parameters, numOfEpisodes): (mapFile, algorithm, repeat, parameters) for mapFile, algorithm, repeat, parameters in tasks}
+            for numOfFinished, future in enumerate(as_completed(futures), 1):
+                try:
+                    key, metrics = future.result()
+                    metrics = list(metrics) + [""]
+                    status = ""
+                except Exception as error:
+                    key = runKey(*futures[future])
+                    metrics = [""] * (len(RESULT_COLUMNS) - 1) + ["%s: %s" % (type(error).__name__, error)]
+                    status = " failed, %s" % metrics[-1]
+                writer.writerow(list(key[:3]) + [value.split("=", 1)[1] for value in key[3:]] + metrics)
+                resultsFile.flush()
+                print("[%d/%d] %s%s" % (numOfFinished, len(tasks), " ".join(key), status), file=sys.stderr)
+
+    return len(tasks)
+
+
+def parseValue(value):
+    for convert in [int, float]:
+        try:
+            return convert(value)
+        except ValueError:
+            pass
+    return value
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a hyperparameter sweep over a process pool and collect the results in a CSV file.")
+    parser.add_argument("mapFiles", nargs="+", help=".gwmap files to train on")
+    parser.add_argument("--grid", action="append", default=[], metavar="NAME=V1,V2,...", help="parameter values, e.g. alpha=0.1,0.2 (repeatable)")
+    parser.add_argument("--algorithm", choices=["ql", "ps"], default="ql")
+    parser.add_argument("--repeats", type=int, default=1)
+    parser.add_argument("--episodes", type=int, default=None, help="train for a fixed number of episodes instead of until convergence")
+    parser.add_argument("--workers", type=int, default=None, help="number of processes, all cores by default")
+    parser.add_argument("--output", default="sweepResults.csv")
+    arguments = parser.parse_args(argv)
+
+    parameterGrid = {}
+    for entry in arguments.grid:
+        name, values = entry.split("=", 1)
+        parameterGrid[name] = [parseValue(value) for value in values.split(",")]
+
+    runSweep(parameterGrid, arguments.mapFiles, arguments.output, arguments.algorithm, arguments.repeats, arguments.episodes, arguments.workers)
+
+
+if __name__ == "__main__":
+    main()
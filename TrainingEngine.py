@@ -0,0 +1,947 @@
+from collections import deque, defaultdict
+from threading import Thread
+
+import os
+import time
+
+import numpy as np
+
+from Checkpoint import loadCheckpoint, saveCheckpoint
+from ConvergenceDetector import VarianceDetector
+from Planner import isGreedyPathOptimal
+from PolicyEvaluator import evaluateGreedyPolicy
+from PQueue import PQueue
+from QTable import QTable, ACTIONS
+from RandomStream import RandomStream
+from SequenceWriter import SEQUENCE_FORMATS, SequenceWriter
+
+
+class TrainingEngine:
+    """
+    Q-learning and prioritized sweeping on a single Environment, without any dependency on the GUI.
+    RLTask builds on this class and only adds the Qt specific parts, the CLI in train.py uses it directly.
+    """
+
+    def __init__(self):
+
+        # RL parameters
+        self.alpha = 0.2
+        self.discountFactor = 0.90
+        self.maxEpsilon = 0.35
+        self.minEpsilon = 0.00001
+        self.epsilonDecayFactor = 0.99992
+        self.epsilonDecayMode = "episode"
+        self.currentEpsilon = self.maxEpsilon
+        self.immRewardAtGoal = 50
+        self.actionDictionary = {"L": "1", "U": "2", "R": "3", "D": "4"}
+
+        # PS parameters
+        self.PQueue = PQueue()
+        self.priorityThreshold = 0.0000000001
+        self.numOfUpdates = 15
+        # backups taken from the queue at once by prioritized sweeping, 1 keeps the one-by-one sweep
+        self.sweepBatchSize = 1
+        # (predecessor, option) pairs the partial model keeps per state, None keeps all of them
+        self.maxPredecessorsPerState = None
+
+        # training parameters
+        self.trainUntilConvergence = True
+        self.numOfEpisodesForTraining = 1000
+        self.resetLearning = True
+        self.generateSequence = False
+
+        # convergence parameters
+        self.convergenceInterval = 15
+        self.varianceThreshold = 0.3
+        self.lastNStepsQueue = deque(maxlen=self.convergenceInterval)
+        self.convergenceDetector = VarianceDetector(self.convergenceInterval, self.varianceThreshold)
+        # also stop as soon as the greedy path from the start is provably optimal
+        self.stopWhenOptimal = False
+        self.reachedOptimalPath = False
+        self.stopReason = None
+        self.QValueSnapshot = None
+
+        # exploration randomness, a fresh seed per run unless one is set
+        self.seed = None
+        self.randomStream = None
+
+        # other parameters
+        self.isTraining = False
+        self.verbose = True
+
+        # "object" keeps Q-values on the State/Option objects, "array" keeps them in a QTable
+        self.backend = "object"
+
+        # action sequence output
+        self.sequenceFileName = "outputFiles/actionSequence.dat"
+        self.sequenceFormat = "text"
+
+        self.options = defaultdict(list)
+        self.optionsKey = None
+        self.optionCoordinates = {}
+        self.initiationSetThread = None
+        # PS detects the subgoals at episode ends so that a run repeats from its seed, or on a background thread that
+        # keeps the GUI responsive but makes the options of an episode depend on timing
+        self.subgoalThread = False
+        # graph generation of the last subgoal detection at an episode end
+        self.subgoalGeneration = -1
+        # subgoals are recomputed once the discovered graph gained subgoalEdgeThreshold edges, or any edge after
+        # subgoalInterval seconds when an interval is set
+        self.subgoalEdgeThreshold = 1
+        self.subgoalInterval = None
+        # carry the path counts of the subgoal detection over between runs instead of counting from scratch
+        self.incrementalSubgoals = False
+        # PivotSampler of the subgoal detection, all nodes are sources when None
+        self.centralitySampler = None
+        self.centralityPool = None
+        self.subgoalCache = None
+
+        # checkpoints, saved every checkpointInterval episodes when set
+        self.checkpointFileName = None
+        self.checkpointInterval = 0
+        self.resumePoint = None
+        # queue, random stream position and subgoal generation of a loaded checkpoint
+        self.resumeState = None
+        self.numOfEpisodes = self.totalNumOfActions = 0
+
+    def setMaxEpsilon(self, maxEpsilon):
+        self.maxEpsilon = maxEpsilon
+
+    def setMinEpsilon(self, minEpsilon):
+        self.minEpsilon = minEpsilon
+
+    def setAlpha(self, alpha):
+        self.alpha = alpha
+
+    def setDiscountFactor(self, discountFactor):
+        self.discountFactor = discountFactor
+
+    def setEpsilonDecayFactor(self, epsilonDecayFactor):
+        self.epsilonDecayFactor = epsilonDecayFactor
+
+    def setEpsilonDecayMode(self, epsilonDecayMode):
+        self.epsilonDecayMode = epsilonDecayMode
+
+    def setNumOfUpdates(self, numOfUpdates):
+        self.numOfUpdates = numOfUpdates
+
+    def setSweepBatchSize(self, sweepBatchSize):
+        self.sweepBatchSize = max(1, int(sweepBatchSize))
+
+    def setMaxPredecessorsPerState(self, maxPredecessorsPerState):
+        self.maxPredecessorsPerState = None if maxPredecessorsPerState is None else max(1, int(maxPredecessorsPerState))
+
+    def setSubgoalRecomputation(self, edgeThreshold=1, interval=None, incremental=False):
+        self.subgoalEdgeThreshold = max(1, int(edgeThreshold))
+        self.subgoalInterval = interval
+        self.incrementalSubgoals = incremental
+
+    def setSubgoalThread(self, subgoalThread):
+        self.subgoalThread = subgoalThread
+
+    def setCentralitySampler(self, centralitySampler):
+        self.centralitySampler = centralitySampler
+
+    def setCentralityPool(self, centralityPool):
+        self.centralityPool = centralityPool
+
+    def setSubgoalCache(self, subgoalCache):
+        self.subgoalCache = subgoalCache
+
+    def setPriorityThreshold(self, priorityThreshold):
+        self.priorityThreshold = priorityThreshold
+
+    def setImmRewardAtGoal(self, immRewardAtGoal):
+        self.immRewardAtGoal = immRewardAtGoal
+
+    def setConvergenceInterval(self, convergenceInterval):
+        self.convergenceInterval = int(convergenceInterval)
+        self.lastNStepsQueue = deque(maxlen=self.convergenceInterval)
+        if isinstance(self.convergenceDetector, VarianceDetector):
+            self.convergenceDetector = VarianceDetector(self.convergenceInterval, self.varianceThreshold)
+
+    def setConvergenceThreshold(self, convergenceThreshold):
+        self.varianceThreshold = convergenceThreshold
+        if isinstance(self.convergenceDetector, VarianceDetector):
+            self.convergenceDetector.threshold = convergenceThreshold
+
+    def setConvergenceDetector(self, convergenceDetector):
+        # any ConvergenceDetector, the default one checks the variance of the last convergenceInterval episodes
+        self.convergenceDetector = convergenceDetector
+
+    def setStopWhenOptimal(self, stopWhenOptimal):
+        self.stopWhenOptimal = stopWhenOptimal
+
+    def setNumOfEpisodesForTraining(self, numOfEpisodesForTraining):
+        self.numOfEpisodesForTraining = numOfEpisodesForTraining
+
+    def setSeed(self, seed):
+        self.seed = seed
+
+    def openRandomStream(self):
+        # every run owns its random stream, the same seed repeats the run exactly
+        self.randomStream = RandomStream(self.seed)
+        return self.randomStream
+
+    def setBackend(self, backend):
+        if backend in ["object", "array"]:
+            self.backend = backend
+
+    def setSequenceFormat(self, sequenceFormat):
+        if sequenceFormat in SEQUENCE_FORMATS:
+            self.sequenceFormat = sequenceFormat
+
+    def setCheckpoint(self, checkpointFileName, checkpointInterval):
+        self.checkpointFileName = checkpointFileName
+        self.checkpointInterval = int(checkpointInterval)
+
+    def saveCheckpoint(self, environment, checkpointFileName=None):
+        saveCheckpoint(checkpointFileName or self.checkpointFileName, self, environment)
+
+    def loadCheckpoint(self, environment, checkpointFileName=None):
+        # the next training run on the environment continues from the checkpoint instead of resetting
+        loadCheckpoint(checkpointFileName or self.checkpointFileName, self, environment)
+
+    def getStartingPoint(self):
+        # (episodes, actions, epsilon) to start counting from, a loaded checkpoint is used once. Runs start here and
+        # the states may have new micro options since the last one, so the Q-value snapshot is linked again
+        self.QValueSnapshot = None
+        if self.resumePoint is None:
+            return 0, 0, self.maxEpsilon
+        startingPoint, self.resumePoint = self.resumePoint, None
+        if self.resumeState is not None:
+            self.PQueue.restoreHeap(*self.resumeState["queue"])
+            if self.resumeState["randomState"] and self.randomStream is not None:
+                self.randomStream.setState(self.resumeState["randomState"])
+            self.subgoalGeneration = self.resumeState["subgoalGeneration"]
+            self.resumeState = None
+        return startingPoint
+
+    def updateCheckpoint(self, environment, numOfEpisodes, totalNumOfActions):
+        self.numOfEpisodes, self.totalNumOfActions = numOfEpisodes, totalNumOfActions
+        if self.checkpointInterval and self.checkpointFileName and numOfEpisodes % self.checkpointInterval == 0:
+            self.saveCheckpoint(environment)
+
+    def checkEnvironment(self, environment):
+        if environment.startCoordinates.count(None) + environment.goalCoordinates.count(None) > 0:
+            raise ValueError("Please set start and goal states.")
+
+    def checkConvergenceDetector(self):
+        # PS with subgoal options needs a criterion that does not judge the primitive actions alone
+        if self.trainUntilConvergence and not self.convergenceDetector.supportsOptions:
+            raise ValueError("The convergence criterion ignores subgoal options, train PS with another one.")
+
+    def setInitiationSetThreadStart(self, environment):
+        self.initiationSetThread = Thread(target=self.setInitiationSet, args=(environment,))
+        self.initiationSetThread.start()
+
+    def stopInitiationSetThread(self):
+        # joined when a run finishes, so that the next run starts its own thread on its own graph
+        if self.initiationSetThread is not None:
+            self.initiationSetThread.join()
+            self.initiationSetThread = None
+
+    def setInitiationSet(self, environment):
+        # sleeps on the graph until it changes instead of recomputing the subgoals of an unchanged graph, and stops with
+        # the run or once resetMapProperties replaced the graph
+        graph = self.prepareSubgoalDetection(environment)
+        computedGeneration = -1
+        computedTime = 0.0
+        while self.isTraining and environment.graph is graph:
+            newEdges = graph.generation - computedGeneration
+            isDue = self.subgoalInterval is not None and time.perf_counter() - computedTime >= self.subgoalInterval
+            if computedGeneration < 0 or newEdges >= self.subgoalEdgeThreshold or (newEdges > 0 and isDue):
+                computedGeneration = graph.generation
+                computedTime = time.perf_counter()
+                graph.setInitiationSets(5, 0.03, 3, environment.goalCoordinates)
+            else:
+                graph.waitForChange(graph.generation, 0.1)
+        return
+
+    def setInitiationSetAtEpisodeEnd(self, environment):
+        # without the thread the subgoals are detected in the training loop, after subgoalEdgeThreshold new edges at
+        # the end of an episode, so that the options of every episode repeat exactly; subgoalInterval is not used
+        graph = self.prepareSubgoalDetection(environment)
+        if self.subgoalGeneration < 0 or graph.generation - self.subgoalGeneration >= self.subgoalEdgeThreshold:
+            self.subgoalGeneration = graph.generation
+            graph.setInitiationSets(5, 0.03, 3, environment.goalCoordinates)
+
+    def prepareSubgoalDetection(self, environment):
+        graph = environment.graph
+        graph.incremental = self.incrementalSubgoals
+        graph.pivotSampler = self.centralitySampler
+        graph.centralityPool = self.centralityPool
+        graph.subgoalCache = self.subgoalCache
+        return graph
+
+    def resetConvergence(self):
+        self.lastNStepsQueue.clear()
+        self.convergenceDetector.reset()
+
+    def isFinished(self, environment, numOfEpisodes, numOfActionsInEpisode):
+        self.lastNStepsQueue.append(numOfActionsInEpisode)
+        self.reachedOptimalPath = self.stopWhenOptimal and self.isGreedyPathOptimal(environment)
+        if self.reachedOptimalPath:
+            self.stopReason = "optimal"
+            return True
+        if not self.trainUntilConvergence:
+            self.stopReason = "episodes" if numOfEpisodes >= self.numOfEpisodesForTraining else None
+            return self.stopReason is not None
+        if self.convergenceDetector.numOfAgents != 1:
+            self.convergenceDetector.reset()
+        QValues = self.getQValueSnapshot(environment) if self.convergenceDetector.requiresQValues else None
+        finished = self.convergenceDetector.update(numOfActionsInEpisode, QValues=QValues)
+        self.stopReason = self.convergenceDetector.stopReasons[0] if finished else None
+        return finished
+
+    def isGreedyPathOptimal(self, environment):
+        # compared against the BFS distances of the map, subgoal options are not part of the greedy policy here
+        policy = self.getQValueSnapshot(environment).argmax(axis=1)
+        return isGreedyPathOptimal(policy, environment.transitionTable, environment.getStateId(environment.startCoordinates), environment.getOptimalDistances())
+
+    def evaluateGreedyPolicy(self, environment, startStates=None):
+        # greedy rollouts from the start state (or the given state ids), separate from the exploring episodes
+        if startStates is None:
+            startStates = environment.getStateId(environment.startCoordinates)
+        return evaluateGreedyPolicy(self.getQValueSnapshot(environment), environment.transitionTable, environment.getStateId(environment.goalCoordinates), startStates, environment.getOptimalDistances())
+
+    def getQValueSnapshot(self, environment):
+        # (states, actions) array of the micro option Q-values, read from the QTable or from the State objects. The
+        # object backend refreshes one snapshot QTable per run in place, the array is overwritten by the next call
+        if self.backend == "array" and environment.QTable is not None:
+            return environment.QTable.getFlatQValues()
+        if self.QValueSnapshot is None or self.QValueSnapshot.linkedStateList is not environment.stateList:
+            self.QValueSnapshot = QTable(environment.mapMatrix, environment.goalCoordinates)
+            self.QValueSnapshot.linkStateList(environment.stateList)
+        else:
+            self.QValueSnapshot.refreshFromLinkedOptions()
+        return self.QValueSnapshot.getFlatQValues()
+
+    def finishTraining(self, environment, algorithm, numOfEpisodes, totalNumOfActions, stepsPerEpisode, startTime):
+        self.isTraining = False
+        self.stopInitiationSetThread()
+        optimalPathLength = int(environment.getOptimalDistances()[environment.getStateId(environment.startCoordinates)])
+        results = {
+            "algorithm": algorithm,
+            "episodes": numOfEpisodes,
+            "actions": totalNumOfActions,
+            "converged": self.stopReason in ["converged", "optimal"],
+            "stopReason": self.stopReason,
+            "reachedOptimalPath": self.reachedOptimalPath,
+            "shortestRecentEpisode": min(self.lastNStepsQueue),
+            "optimalPathLength": optimalPathLength,
+            "finalEpsilon": self.currentEpsilon,
+            "wallTime": time.perf_counter() - startTime,
+            # the subgoal thread makes PS depend on timing, its seed would not repeat the run
+            "seed": None if algorithm == "PS" and self.subgoalThread else self.randomStream.seed,
+            "stepsPerEpisode": stepsPerEpisode,
+        }
+        if self.centralitySampler is not None:
+            results["centralityErrorBound"] = environment.graph.centralityErrorBound
+        # stage times of the last subgoal detection, only PS runs one
+        if environment.graph.timings:
+            results["subgoalTimings"] = dict(environment.graph.timings)
+        if self.verbose:
+            print("%s %s %d episodes, %d actions, shortest recent episode has %d actions, optimal path has %d actions." % (algorithm, "converged in" if results["converged"] else "trained for", numOfEpisodes, totalNumOfActions, min(self.lastNStepsQueue), optimalPathLength))
+        return results
+
+    def getQTable(self, environment):
+        # the QTable lives on the environment so that learning survives between runs when resetLearning is off
+        if (self.resetLearning and self.resumePoint is None) or environment.QTable is None or environment.QTable.gridSize != tuple(environment.gridSize):
+            environment.QTable = QTable(environment.mapMatrix, environment.goalCoordinates, environment.stateList[environment.goalCoordinates].immReward)
+        return environment.QTable
+
+    def applyQLearning(self, environment):
+
+        if self.backend == "array":
+            return self.applyQLearningOnQTable(environment)
+
+        self.checkEnvironment(environment)
+        self.isTraining = True
+        startTime = time.perf_counter()
+        randomStream = self.openRandomStream()
+
+        states = environment.stateList.ravel().tolist()
+        transitionTable = environment.transitionTable
+        numberOfVisits = environment.numberOfVisits.reshape(-1)
+        lastVisitEpisode = environment.lastVisitEpisode
+
+        if self.resetLearning and self.resumePoint is None:
+            environment.resetLearning()
+            self.resetConvergence()
+            if self.generateSequence:
+                self.clearSequenceFile()
+
+        numOfEpisodes, totalNumOfActions, self.currentEpsilon = self.getStartingPoint()
+        stepsPerEpisode = []
+
+        if self.generateSequence:
+            sequenceWriter = self.openSequenceWriter(environment)
+
+        # episode loop
+        while True:
+
+            episodeId = environment.beginEpisode()
+
+            currentStateId = environment.getStateId(environment.startCoordinates)
+            numOfEpisodes += 1
+            numOfActionsInEpisode = 0
+
+            # action loop
+            nextState = states[currentStateId]
+            while not nextState.isGoal:
+                currentState = states[currentStateId]
+
+                if lastVisitEpisode[currentStateId] != episodeId:
+                    lastVisitEpisode[currentStateId] = episodeId
+                    numberOfVisits[currentStateId] += 1
+
+                chosenAction = currentState.getOption(self.currentEpsilon, randomStream=randomStream)
+                if chosenAction.actionIndex is None:
+                    nextStateId = chosenAction.destinationState
+                else:
+                    nextStateId = transitionTable.item(currentStateId, chosenAction.actionIndex)
+                nextState = states[nextStateId]
+                chosenAction.QValue += self.alpha * (nextState.immReward + self.discountFactor * nextState.getMaxQValue() - chosenAction.QValue)
+                currentStateId = nextStateId
+                numOfActionsInEpisode += 1
+                if self.generateSequence and chosenAction.actionIndex is not None:
+                    sequenceWriter.write(chosenAction.actionIndex)
+                if self.epsilonDecayMode == "step" and self.currentEpsilon > self.minEpsilon:
+                    self.currentEpsilon *= self.epsilonDecayFactor
+
+            stepsPerEpisode.append(numOfActionsInEpisode)
+            if self.generateSequence:
+                sequenceWriter.endEpisode()
+            totalNumOfActions += numOfActionsInEpisode
+            if self.epsilonDecayMode == "episode" and self.currentEpsilon > self.minEpsilon:
+                self.currentEpsilon *= self.epsilonDecayFactor
+            self.updateCheckpoint(environment, numOfEpisodes, totalNumOfActions)
+
+            if self.isFinished(environment, numOfEpisodes, numOfActionsInEpisode):
+                if self.generateSequence:
+                    sequenceWriter.close()
+                return self.finishTraining(environment, "QL", numOfEpisodes, totalNumOfActions, stepsPerEpisode, startTime)
+
+    def applyQLearningOnQTable(self, environment):
+
+        self.checkEnvironment(environment)
+        self.isTraining = True
+        startTime = time.perf_counter()
+
+        if self.resetLearning and self.resumePoint is None:
+            environment.resetLearning()
+            self.resetConvergence()
+            if self.generateSequence:
+                self.clearSequenceFile()
+
+        QTable = self.getQTable(environment)
+        QValues = QTable.getFlatQValues()
+        immRewards = QTable.getFlatImmRewards().tolist()
+        validActionLists = QTable.validActionLists
+        transitionTable = environment.transitionTable
+        startState = environment.getStateId(environment.startCoordinates)
+        goalState = environment.getStateId(environment.goalCoordinates)
+        numberOfVisits = environment.numberOfVisits.reshape(-1)
+        lastVisitEpisode = environment.lastVisitEpisode
+        randomStream = self.openRandomStream()
+        uniform = randomStream.uniform
+        choice = randomStream.choice
+
+        numOfEpisodes, totalNumOfActions, self.currentEpsilon = self.getStartingPoint()
+        stepsPerEpisode = []
+
+        if self.generateSequence:
+            sequenceWriter = self.openSequenceWriter(environment)
+
+        # episode loop
+        while True:
+
+            episodeId = environment.beginEpisode()
+            currentState = startState
+            numOfEpisodes += 1
+            numOfActionsInEpisode = 0
+
+            # action loop
+            while currentState != goalState:
+
+                if lastVisitEpisode[currentState] != episodeId:
+                    lastVisitEpisode[currentState] = episodeId
+                    numberOfVisits[currentState] += 1
+
+                # epsilon greedy choice, same rule as State.getOption; a 4 element row is cheaper as a list
+                QRow = QValues[currentState].tolist()
+                bestQValue = max(QRow)
+                chosenAction = QRow.index(bestQValue)
+                if bestQValue == 0 or uniform() <= self.currentEpsilon:
+                    chosenAction = choice(validActionLists[currentState])
+
+                nextState = transitionTable.item(currentState, chosenAction)
+
+                # max-Q of the next state includes its immediate reward, as State.getMaxQValue does
+                immReward = immRewards[nextState]
+                nextMaxQValue = (max(QValues[nextState].tolist()) if validActionLists[nextState] else 0.0) + immReward
+                QValues[currentState, chosenAction] = QRow[chosenAction] + self.alpha * (immReward + self.discountFactor * nextMaxQValue - QRow[chosenAction])
+
+                currentState = nextState
+                numOfActionsInEpisode += 1
+                if self.generateSequence:
+                    sequenceWriter.write(chosenAction)
+                if self.epsilonDecayMode == "step" and self.currentEpsilon > self.minEpsilon:
+                    self.currentEpsilon *= self.epsilonDecayFactor
+
+            stepsPerEpisode.append(numOfActionsInEpisode)
+            if self.generateSequence:
+                sequenceWriter.endEpisode()
+            totalNumOfActions += numOfActionsInEpisode
+            if self.epsilonDecayMode == "episode" and self.currentEpsilon > self.minEpsilon:
+                self.currentEpsilon *= self.epsilonDecayFactor
+            self.updateCheckpoint(environment, numOfEpisodes, totalNumOfActions)
+
+            if self.isFinished(environment, numOfEpisodes, numOfActionsInEpisode):
+                if self.generateSequence:
+                    sequenceWriter.close()
+                # export so that the GUI views keep working on the State objects
+                QTable.exportToStateList(environment.stateList)
+                return self.finishTraining(environment, "QL", numOfEpisodes, totalNumOfActions, stepsPerEpisode, startTime)
+
+    def applyPrioritizedSweeping(self, environment):
+
+        if self.backend == "array":
+            return self.applyPrioritizedSweepingOnQTable(environment)
+
+        self.checkEnvironment(environment)
+        self.checkConvergenceDetector()
+
+        # started training
+        self.isTraining = True
+        startTime = time.perf_counter()
+
+        # clear priority queue and seed the exploration
+        self.PQueue.clear()
+        randomStream = self.openRandomStream()
+
+        # get data holders
+        states = environment.stateList.ravel().tolist()
+        transitionTable = environment.transitionTable
+        numberOfVisits = environment.numberOfVisits.reshape(-1)
+        lastVisitEpisode = environment.lastVisitEpisode
+
+        # reset learning if specified
+        if self.resetLearning and self.resumePoint is None:
+            environment.resetLearning()
+            environment.resetMapProperties()
+            self.resetConvergence()
+            if self.generateSequence:
+                self.clearSequenceFile()
+        environment.model.maxPredecessorsPerState = self.maxPredecessorsPerState
+
+        # initialize counters and set epsilon to max, or continue from a loaded checkpoint
+        self.subgoalGeneration = -1
+        numOfEpisodes, totalNumOfActions, self.currentEpsilon = self.getStartingPoint()
+        self.numOfBackups = 0
+        self.sweepTime = 0.0
+        stepsPerEpisode = []
+
+        # create sequence holder if specified
+        if self.generateSequence:
+            sequenceWriter = self.openSequenceWriter(environment)
+
+        # episode loop
+        while True:
+
+            # start looking for subgoals after 5 episodes, on a thread when one is asked for
+            if numOfEpisodes >= 5 and self.subgoalThread and (self.initiationSetThread is None or not self.initiationSetThread.is_alive()):
+                self.setInitiationSetThreadStart(environment)
+
+            # construct the options of the previous episode here, so that a run resumed from a checkpoint builds them too
+            if numOfEpisodes > 0:
+                if numOfEpisodes >= 5 and not self.subgoalThread:
+                    self.setInitiationSetAtEpisodeEnd(environment)
+                self.constructOptions(environment)
+
+            episodeId = environment.beginEpisode()
+
+            # place the agent on the start state
+            currentStateId = environment.getStateId(environment.startCoordinates)
+
+            # increment episode number
+            numOfEpisodes += 1
+
+            # reset number of steps taken
+            numOfActionsInEpisode = 0
+
+            # action loop
+            nextState = states[currentStateId]
+            while not nextState.isGoal:
+
+                # get the current state
+                currentState = states[currentStateId]
+
+                # update visit information
+                if lastVisitEpisode[currentStateId] != episodeId:
+                    lastVisitEpisode[currentStateId] = episodeId
+                    numberOfVisits[currentStateId] += 1
+
+                # select an option
+                chosenOption = currentState.getOption(self.currentEpsilon, randomStream=randomStream)
+
+                # get the next state from the transition table, subgoal options jump to their subgoal
+                if chosenOption.actionIndex is None:
+                    nextStateId = chosenOption.destinationState
+                else:
+                    nextStateId = transitionTable.item(currentStateId, chosenOption.actionIndex)
+                nextState = states[nextStateId]
+
+                # calculate priority
+                priority = abs(nextState.immReward + self.discountFactor * nextState.getMaxQValue() - chosenOption.QValue)
+
+                # insert to partial model and priority queue
+                self.insertToModel(environment, chosenOption, nextStateId, nextState.immReward)
+                self.insertToPQueue(chosenOption, priority)
+
+                currentCoordinates, nextCoordinates = currentState.coordinates, nextState.coordinates
+                distance = abs(nextCoordinates[0] - currentCoordinates[0]) + abs(nextCoordinates[1] - currentCoordinates[1])
+                if distance == 1 and not environment.graph.hasEdge(currentCoordinates, nextCoordinates):
+                    environment.graph.addEdge(currentCoordinates, nextCoordinates)
+
+                # move the agent to the next state
+                currentStateId = nextStateId
+
+                # update partial map matrix
+                environment.partialMapMatrix[nextCoordinates] = nextState.stateType
+
+                # increment step counter
+                numOfActionsInEpisode += 1
+
+                # update sequence if specified, subgoal options have no primitive action code
+                if self.generateSequence and chosenOption.actionIndex is not None:
+                    sequenceWriter.write(chosenOption.actionIndex)
+
+                # decrease epsilon if "step" mode is selected
+                if self.epsilonDecayMode == "step" and self.currentEpsilon > self.minEpsilon:
+                    self.currentEpsilon *= self.epsilonDecayFactor
+
+                # sweep loop
+                sweepStartTime = time.perf_counter()
+                if self.sweepBatchSize == 1:
+                    self.sweepOptions(environment, states, transitionTable)
+                else:
+                    self.sweepOptionsInBatches(environment, states, transitionTable)
+                self.sweepTime += time.perf_counter() - sweepStartTime
+
+            stepsPerEpisode.append(numOfActionsInEpisode)
+            if self.generateSequence:
+                sequenceWriter.endEpisode()
+
+            # increment total number of steps counter
+            totalNumOfActions += numOfActionsInEpisode
+
+            # decrease epsilon if "episode" mode is selected
+            if self.epsilonDecayMode == "episode" and self.currentEpsilon > self.minEpsilon:
+                self.currentEpsilon *= self.epsilonDecayFactor
+            self.updateCheckpoint(environment, numOfEpisodes, totalNumOfActions)
+
+            # trained for a specific number of episodes or until convergence
+            if self.isFinished(environment, numOfEpisodes, numOfActionsInEpisode):
+                if self.generateSequence:
+                    sequenceWriter.close()
+                return self.finishSweeping(environment, numOfEpisodes, totalNumOfActions, stepsPerEpisode, startTime)
+
+    def applyPrioritizedSweepingOnQTable(self, environment):
+        """
+        Prioritized sweeping over primitive actions on a QTable. Queue items are stateId * 4 + action and the partial
+        model is keyed by the action index. Subgoal options are not used by this backend.
+        """
+
+        self.checkEnvironment(environment)
+        self.isTraining = True
+        startTime = time.perf_counter()
+        self.PQueue.clear()
+
+        if self.resetLearning and self.resumePoint is None:
+            environment.resetLearning()
+            environment.resetMapProperties()
+            self.resetConvergence()
+            if self.generateSequence:
+                self.clearSequenceFile()
+        environment.model.maxPredecessorsPerState = self.maxPredecessorsPerState
+
+        QTable = self.getQTable(environment)
+        QValues = QTable.getFlatQValues()
+        immRewards = QTable.getFlatImmRewards()
+        hasActions = QTable.validActions.reshape(QTable.numOfStates, -1).any(axis=1)
+        validActionLists = QTable.validActionLists
+        transitionTable = environment.transitionTable
+        stateTypes = [state.stateType for state in environment.stateList.ravel().tolist()]
+        startState = environment.getStateId(environment.startCoordinates)
+        goalState = environment.getStateId(environment.goalCoordinates)
+        numOfCols = environment.gridSize[1]
+        numberOfVisits = environment.numberOfVisits.reshape(-1)
+        lastVisitEpisode = environment.lastVisitEpisode
+        model = environment.model
+        graph = environment.graph
+        randomStream = self.openRandomStream()
+        uniform = randomStream.uniform
+        choice = randomStream.choice
+
+        numOfEpisodes, totalNumOfActions, self.currentEpsilon = self.getStartingPoint()
+        self.numOfBackups = 0
+        self.sweepTime = 0.0
+        stepsPerEpisode = []
+
+        if self.generateSequence:
+            sequenceWriter = self.openSequenceWriter(environment)
+
+        # episode loop
+        while True:
+
+            episodeId = environment.beginEpisode()
+            currentState = startState
+            numOfEpisodes += 1
+            numOfActionsInEpisode = 0
+
+            # action loop
+            while currentState != goalState:
+
+                if lastVisitEpisode[currentState] != episodeId:
+                    lastVisitEpisode[currentState] = episodeId
+                    numberOfVisits[currentState] += 1
+
+                # epsilon greedy choice, same rule as State.getOption
+                QRow = QValues[currentState].tolist()
+                bestQValue = max(QRow)
+                chosenAction = QRow.index(bestQValue)
+                if bestQValue == 0 or uniform() <= self.currentEpsilon:
+                    chosenAction = choice(validActionLists[currentState])
+
+                nextState = transitionTable.item(currentState, chosenAction)
+                immReward = immRewards.item(nextState)
+                nextMaxQValue = (max(QValues[nextState].tolist()) if hasActions[nextState] else 0.0) + immReward
+                priority = abs(immReward + self.discountFactor * nextMaxQValue - QRow[chosenAction])
+
+                # insert to partial model and priority queue
+                model.insert(currentState, chosenAction, nextState, immReward)
+                if priority >= self.priorityThreshold:
+                    self.PQueue.push(currentState * 4 + chosenAction, priority)
+
+                currentCoordinates = divmod(currentState, numOfCols)
+                nextCoordinates = divmod(nextState, numOfCols)
+                distance = abs(nextCoordinates[0] - currentCoordinates[0]) + abs(nextCoordinates[1] - currentCoordinates[1])
+                if distance == 1 and not graph.hasEdge(currentCoordinates, nextCoordinates):
+                    graph.addEdge(currentCoordinates, nextCoordinates)
+                environment.partialMapMatrix[nextCoordinates] = stateTypes[nextState]
+
+                currentState = nextState
+                numOfActionsInEpisode += 1
+                if self.generateSequence:
+                    sequenceWriter.write(chosenAction)
+                if self.epsilonDecayMode == "step" and self.currentEpsilon > self.minEpsilon:
+                    self.currentEpsilon *= self.epsilonDecayFactor
+
+                # sweep loop
+                sweepStartTime = time.perf_counter()
+                if self.sweepBatchSize == 1:
+                    self.sweepQTable(QValues, immRewards, hasActions, transitionTable, model)
+                else:
+                    self.sweepQTableInBatches(QValues, immRewards, hasActions, transitionTable, model)
+                self.sweepTime += time.perf_counter() - sweepStartTime
+
+            stepsPerEpisode.append(numOfActionsInEpisode)
+            if self.generateSequence:
+                sequenceWriter.endEpisode()
+            totalNumOfActions += numOfActionsInEpisode
+            if self.epsilonDecayMode == "episode" and self.currentEpsilon > self.minEpsilon:
+                self.currentEpsilon *= self.epsilonDecayFactor
+            self.updateCheckpoint(environment, numOfEpisodes, totalNumOfActions)
+
+            if self.isFinished(environment, numOfEpisodes, numOfActionsInEpisode):
+                if self.generateSequence:
+                    sequenceWriter.close()
+                QTable.exportToStateList(environment.stateList)
+                return self.finishSweeping(environment, numOfEpisodes, totalNumOfActions, stepsPerEpisode, startTime)
+
+    def finishSweeping(self, environment, numOfEpisodes, totalNumOfActions, stepsPerEpisode, startTime):
+        results = self.finishTraining(environment, "PS", numOfEpisodes, totalNumOfActions, stepsPerEpisode, startTime)
+        results["backups"] = self.numOfBackups
+        results["backupsPerSecond"] = self.numOfBackups / self.sweepTime if self.sweepTime > 0 else 0.0
+        return results
+
+    def sweepOptions(self, environment, states, transitionTable):
+        # numOfUpdates backups, one queued option at a time
+        for n in range(int(self.numOfUpdates)):
+            if self.PQueue.ifEmpty():
+                break
+            bestAction = self.PQueue.pop()
+            sweptStateId = self.getSweptStateId(bestAction, transitionTable)
+            sweptState = states[sweptStateId]
+            bestAction.QValue += self.alpha * (sweptState.immReward + self.discountFactor * sweptState.getMaxQValue() - bestAction.QValue)
+            self.numOfBackups += 1
+            self.sweep(environment, sweptStateId, states)
+
+    def sweepOptionsInBatches(self, environment, states, transitionTable):
+        # numOfUpdates backups, sweepBatchSize queued options (subgoal options included) at a time; the options of a
+        # batch are backed up together from the same Q-values, and the predecessors of the states they lead to are
+        # re-prioritised once per state and queued with a single pushMany
+        PQueue = self.PQueue
+        numOfUpdatesLeft = int(self.numOfUpdates)
+        while numOfUpdatesLeft > 0 and not PQueue.ifEmpty():
+            options, _ = PQueue.popMany(min(self.sweepBatchSize, numOfUpdatesLeft))
+            numOfUpdatesLeft -= len(options)
+            self.numOfBackups += len(options)
+
+            sweptStateIds = [self.getSweptStateId(option, transitionTable) for option in options]
+            targets = [states[stateId].immReward + self.discountFactor * states[stateId].getMaxQValue() for stateId in sweptStateIds]
+            for option, target in zip(options, targets):
+                option.QValue += self.alpha * (target - option.QValue)
+
+            items, priorities = [], []
+            for stateId in dict.fromkeys(sweptStateIds):
+                maxQValue = states[stateId].getMaxQValue()
+                for (predecessorStateId, optionType), rewardFromModel in environment.model.getPredecessors(stateId):
+                    action = states[predecessorStateId].policies["mu"].get(optionType)
+                    if action is None:
+                        continue
+                    priority = abs(rewardFromModel + self.discountFactor * maxQValue - action.QValue)
+                    if priority >= self.priorityThreshold:
+                        items.append(action)
+                        priorities.append(priority)
+            PQueue.pushMany(items, priorities)
+
+    def getSweptStateId(self, option, transitionTable):
+        # state an option leads to, subgoal options jump to their subgoal
+        if option.actionIndex is None:
+            return option.destinationState
+        return transitionTable.item(option.sourceState, option.actionIndex)
+
+    def sweepQTable(self, QValues, immRewards, hasActions, transitionTable, model):
+        # numOfUpdates backups, one queue item at a time
+        PQueue = self.PQueue
+        for n in range(int(self.numOfUpdates)):
+            if PQueue.ifEmpty():
+                break
+            sweptState, sweptAction = divmod(PQueue.pop(), 4)
+            nextState = transitionTable.item(sweptState, sweptAction)
+            immReward = immRewards.item(nextState)
+            nextMaxQValue = (max(QValues[nextState].tolist()) if hasActions[nextState] else 0.0) + immReward
+            QValues[sweptState, sweptAction] += self.alpha * (immReward + self.discountFactor * nextMaxQValue - QValues.item(sweptState, sweptAction))
+            self.numOfBackups += 1
+
+            maxQValue = (max(QValues[sweptState].tolist()) if hasActions[sweptState] else 0.0) + immRewards.item(sweptState)
+            for (predecessorState, action), rewardFromModel in model.getPredecessors(sweptState):
+                priority = abs(rewardFromModel + self.discountFactor * maxQValue - QValues.item(predecessorState, action))
+                if priority >= self.priorityThreshold:
+                    PQueue.push(predecessorState * 4 + action, priority)
+
+    def sweepQTableInBatches(self, QValues, immRewards, hasActions, transitionTable, model):
+        # numOfUpdates backups, sweepBatchSize queue items at a time; the items of a batch are backed up together
+        # from the same Q-values, and their predecessors are re-prioritised and queued with a single pushMany
+        PQueue = self.PQueue
+        numOfUpdatesLeft = int(self.numOfUpdates)
+        while numOfUpdatesLeft > 0 and not PQueue.ifEmpty():
+            items, _ = PQueue.popMany(min(self.sweepBatchSize, numOfUpdatesLeft))
+            numOfUpdatesLeft -= len(items)
+            self.numOfBackups += len(items)
+
+            sweptStates, sweptActions = np.divmod(np.array(items), 4)
+            nextStates = transitionTable[sweptStates, sweptActions]
+            nextImmRewards = immRewards[nextStates]
+            nextMaxQValues = np.where(hasActions[nextStates], QValues[nextStates].max(axis=1), 0.0) + nextImmRewards
+            oldQValues = QValues[sweptStates, sweptActions]
+            QValues[sweptStates, sweptActions] = oldQValues + self.alpha * (nextImmRewards + self.discountFactor * nextMaxQValues - oldQValues)
+
+            # gather the observed predecessors of every swept state
+            sweptStates = np.unique(sweptStates).tolist()
+            predecessorStates, actions, rewards, successorStates = [], [], [], []
+            for sweptState in sweptStates:
+                for (predecessorState, action), rewardFromModel in model.getPredecessors(sweptState):
+                    predecessorStates.append(predecessorState)
+                    actions.append(action)
+                    rewards.append(rewardFromModel)
+                    successorStates.append(sweptState)
+            if not predecessorStates:
+                continue
+
+            predecessorStates = np.array(predecessorStates)
+            actions = np.array(actions)
+            successorStates = np.array(successorStates)
+            maxQValues = np.where(hasActions[successorStates], QValues[successorStates].max(axis=1), 0.0) + immRewards[successorStates]
+            priorities = np.abs(np.array(rewards) + self.discountFactor * maxQValues - QValues[predecessorStates, actions])
+            queued = priorities >= self.priorityThreshold
+            PQueue.pushMany((predecessorStates[queued] * 4 + actions[queued]).tolist(), priorities[queued].tolist())
+
+    def constructOptions(self, environment):
+
+        # get data holders
+        stateList = environment.stateList
+
+        # the initiation sets of the graph are replaced as a whole, a new version is the only thing to react to
+        graph = environment.graph
+        optionsKey = (graph, graph.initiationSetsVersion)
+        if optionsKey == self.optionsKey:
+            return
+        self.optionsKey = optionsKey
+        rawOptions = {subGoal: list(states) for subGoal, states in graph.initiationSets.items()}
+
+        # the (row, col) of every node options were built on, kept past resetMapProperties so that the options of
+        # an earlier graph can still be removed; option names are never parsed here
+        self.optionCoordinates.update(graph.coordinates)
+        coordinates = self.optionCoordinates
+
+        # this loop updates the constructed options (add & remove)
+        for subGoal in rawOptions:
+
+            if subGoal in self.options:
+                for state in rawOptions[subGoal]:
+                    if state in self.options[subGoal]:
+                        del self.options[subGoal][self.options[subGoal].index(state)]
+                    else:
+                        QValue = stateList[coordinates[subGoal]].getMaxQValue()
+                        stateList[coordinates[state]].addOption(subGoal, QValue=QValue)
+                for leftState in self.options[subGoal]:
+                    stateList[coordinates[leftState]].deleteOption(subGoal)
+                del self.options[subGoal]
+
+            else:
+                for state in rawOptions[subGoal]:
+                    QValue = stateList[coordinates[subGoal]].getMaxQValue()
+                    stateList[coordinates[state]].addOption(subGoal, QValue=QValue)
+
+        for leftSubGoal in self.options:
+            for leftState in self.options[leftSubGoal]:
+                stateList[coordinates[leftState]].deleteOption(leftSubGoal)
+
+        # update options
+        self.options = rawOptions
+
+    def clearSequenceFile(self):
+        sequenceFolder = os.path.dirname(self.sequenceFileName)
+        if sequenceFolder and not os.path.exists(sequenceFolder):
+            os.makedirs(sequenceFolder)
+        sequenceFile = open(self.sequenceFileName, "w")
+        sequenceFile.close()
+
+    def openSequenceWriter(self, environment):
+        # actions are streamed to the sequence file while training runs
+        return SequenceWriter(self.sequenceFileName, [self.actionDictionary[action] for action in ACTIONS], self.sequenceFormat, mapName=environment.mapFileName, actions=ACTIONS)
+
+    def insertToModel(self, environment, chosenOption, nextStateId, reward):
+        environment.model.insert(chosenOption.sourceState, chosenOption.optionType, nextStateId, reward)
+
+    def insertToPQueue(self, chosenAction, priority):
+        if priority >= self.priorityThreshold:
+            self.PQueue.push(chosenAction, priority)
+
+    def calculatePriority(self, chosenAction, nextState):
+        return abs(nextState.immReward + self.discountFactor * nextState.getMaxQValue() - chosenAction.QValue)
+
+    def sweep(self, environment, stateId, states):
+        # re-prioritise every observed (predecessor, option) pair leading to the swept state
+        maxQValue = states[stateId].getMaxQValue()
+        for (predecessorStateId, optionType), rewardFromModel in environment.model.getPredecessors(stateId):
+            action = states[predecessorStateId].policies["mu"].get(optionType)
+            if action is None:
+                # the option was removed since the transition was observed
+                continue
+            priority = abs(rewardFromModel + self.discountFactor * maxQValue - action.QValue)
+            self.insertToPQueue(action, priority)
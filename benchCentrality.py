@@ -0,0 +1,55 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import time
+
+import numpy as np
+
+from Environment import loadEnvironment
+from GraphXv2 import GraphX
+from GridGraph import GridGraph
+from ParallelCentrality import CentralityPool
+
+
+def timeIt(function, repeats=3):
+    # best of repeats, the result of the last call
+    bestTime = float("inf")
+    for repeat in range(repeats):
+        startTime = time.perf_counter()
+        result = function()
+        bestTime = min(bestTime, time.perf_counter() - startTime)
+    return bestTime, result
+
+
+def main():
+    # exact betweenness and subgoal path counts split over 1, 2, 4, ... processes against the serial versions
+    mapFiles = sys.argv[1:] or ["mapFiles/hugeHalls.gwmap", "mapFiles/ManyHole.gwmap"]
+    processCounts = sorted(set([2 ** power for power in range(os.cpu_count().bit_length()) if 2 ** power <= os.cpu_count()] + [os.cpu_count()]))
+    pools = {processes: CentralityPool(processes) for processes in processCounts}
+
+    print("%d cores" % os.cpu_count())
+    for mapFile in mapFiles:
+        environment = loadEnvironment(mapFile)
+        gridGraph = GridGraph(environment.mapMatrix)
+        graph = GraphX()
+        graph.createMapToGraph(environment.mapMatrix)
+        serialBetweennessTime, serialBetweenness = timeIt(gridGraph.betweenness)
+        serialCountTime, serialCounts = timeIt(lambda: graph.countPathOccurrences(graph.graph))
+        print("%s, %d nodes  serial betweenness %.3f s  path counts %.3f s" % (mapFile, len(gridGraph.nodes), serialBetweennessTime, serialCountTime))
+
+        for processes, pool in pools.items():
+            graph.centralityPool = pool
+            betweennessTime, betweenness = timeIt(lambda: gridGraph.betweenness(pool=pool))
+            countTime, counts = timeIt(lambda: graph.countPathOccurrences(graph.graph))
+            same = np.allclose(betweenness, serialBetweenness) and counts == serialCounts
+            print("  %2d processes  betweenness %.3f s (x%.2f)  path counts %.3f s (x%.2f)  same %s" % (processes, betweennessTime, serialBetweennessTime / betweennessTime, countTime, serialCountTime / countTime, same))
+        graph.centralityPool = None
+
+    for pool in pools.values():
+        pool.close()
+
+
+if __name__ == "__main__":
+    main()
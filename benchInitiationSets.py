@@ -0,0 +1,55 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import sys
+import time
+
+from Environment import loadEnvironment
+from GraphXv2 import GraphX
+
+
+def timeIt(function):
+    startTime = time.perf_counter()
+    result = function()
+    return time.perf_counter() - startTime, result
+
+
+def countOneByOne(graph, snapshot, subgoals):
+    # the subgoals of every BFS tree one after another, as the incremental mode still counts them
+    counts = {subgoal: dict.fromkeys(snapshot, 0) for subgoal in subgoals}
+    for source in snapshot:
+        graph.addTreeSubgoalOccurrences(graph.shortestPathTree(snapshot, source), counts)
+    return counts
+
+
+def main():
+    # stage timings of one subgoal detection, then the cost per subgoal of the subgoal path counts and the
+    # initiation set filters, one subgoal at a time against all subgoals batched
+    mapFiles = sys.argv[1:] or ["mapFiles/hugeHalls.gwmap", "mapFiles/ManyHole.gwmap"]
+    for mapFile in mapFiles:
+        environment = loadEnvironment(mapFile)
+        graph = GraphX()
+        graph.createMapToGraph(environment.mapMatrix)
+        graph.setInitiationSets(5, 0.03, 3, environment.goalCoordinates)
+        timings = graph.timings
+        print("%s, %d nodes, %d subgoals" % (mapFile, len(graph.graph), timings["subgoals"]))
+        print("  path counts %.3f s  detection %.3f s  subgoal path counts %.3f s  initiation sets %.3f s  per subgoal %.4f s" % (timings["pathCounts"], timings["subgoalDetection"], timings["subgoalPathCounts"], timings["initiationSets"], timings["perSubgoal"]))
+
+        generation, snapshot = graph.getSnapshot()
+        index = graph.getNeighbourhoodIndex(snapshot, 5, generation)
+        nodes = list(snapshot)
+        batchSize = graph.initiationSetBatchSize
+        for numOfSubgoals in [1, 4, 16, 64]:
+            subgoals = nodes[::len(nodes) // numOfSubgoals][:numOfSubgoals]
+            loopCountTime, loopCounts = timeIt(lambda: countOneByOne(graph, snapshot, subgoals))
+            batchCountTime, batchCounts = timeIt(lambda: graph.countSubgoalPathOccurrences(snapshot, subgoals))
+            graph.initiationSetBatchSize = 1
+            loopFilterTime, loopSets = timeIt(lambda: graph.buildInitiationSets(index, subgoals, batchCounts, 3))
+            graph.initiationSetBatchSize = batchSize
+            batchFilterTime, batchSets = timeIt(lambda: graph.buildInitiationSets(index, subgoals, batchCounts, 3))
+            same = loopCounts == batchCounts and loopSets == batchSets
+            print("  %2d subgoals  counts %.4f -> %.4f s/subgoal  filters %.4f -> %.4f s/subgoal  same %s" % (numOfSubgoals, loopCountTime / numOfSubgoals, batchCountTime / numOfSubgoals, loopFilterTime / numOfSubgoals, batchFilterTime / numOfSubgoals, same))
+
+
+if __name__ == "__main__":
+    main()
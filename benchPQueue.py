@@ -0,0 +1,72 @@
+import heapq
+import random
+import sys
+import timeit
+
+from PQueue import PQueue
+
+
+# the list based queue PQueue used to be, kept here as the reference for the benchmark
+class LegacyPQueue:
+    def __init__(self):
+        self._queue = []
+
+    def push(self, item, priority):
+        if not self.ifExists(item):
+            heapq.heappush(self._queue, (-priority, item))
+        else:
+            if self.deleteWorse(item, priority):
+                heapq.heappush(self._queue, (-priority, item))
+
+    def pop(self):
+        return heapq.heappop(self._queue)[-1]
+
+    def ifExists(self, item):
+        return any(entry[1] == item for entry in self._queue)
+
+    def deleteWorse(self, item, priority):
+        if self.ifExists(item):
+            worseList = [i for i, entry in enumerate(self._queue) if item == entry[1] and -priority < entry[0]]
+            if len(worseList) > 0:
+                del self._queue[worseList[0]]
+                heapq.heapify(self._queue)
+                return True
+        return False
+
+    def ifEmpty(self):
+        return not self._queue
+
+
+# pushes a stream of (item, priority) pairs drawn from numOfItems distinct items, popping every popInterval pushes
+def run(queueClass, operations, popInterval):
+    queue = queueClass()
+    for n, (item, priority) in enumerate(operations):
+        queue.push(item, priority)
+        if n % popInterval == 0 and not queue.ifEmpty():
+            queue.pop()
+
+
+def main():
+    numOfItems = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    numOfOperations = 10 * numOfItems
+    popInterval = 15
+    random.seed(0)
+    operations = [(random.randrange(numOfItems), random.random()) for _ in range(numOfOperations)]
+
+    # both queues must pop the same priorities
+    legacy, indexed = LegacyPQueue(), PQueue()
+    for item, priority in operations:
+        legacy.push(item, priority)
+        indexed.push(item, priority)
+    legacyPriorities = sorted(-entry[0] for entry in legacy._queue)
+    indexedPriorities = sorted(indexed.getPriority(item) for item in indexed._heap)
+    assert legacyPriorities == indexedPriorities
+
+    print("%d pushes over %d items, one pop every %d pushes" % (numOfOperations, numOfItems, popInterval))
+    for queueClass in [LegacyPQueue, PQueue]:
+        seconds = min(timeit.repeat(lambda: run(queueClass, operations, popInterval), number=1, repeat=3))
+        print("%-12s %8.3f s  %10.0f ops/s" % (queueClass.__name__, seconds, numOfOperations / seconds))
+
+
+if __name__ == "__main__":
+    main()
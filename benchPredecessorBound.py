@@ -0,0 +1,46 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import sys
+
+from Environment import loadEnvironment
+from TrainingEngine import TrainingEngine
+
+
+def run(mapFile, seed, numOfEpisodes, maxPredecessorsPerState, backend):
+    environment = loadEnvironment(mapFile)
+    engine = TrainingEngine()
+    engine.verbose = False
+    engine.setSeed(seed)
+    engine.setBackend(backend)
+    engine.setMaxPredecessorsPerState(maxPredecessorsPerState)
+    engine.trainUntilConvergence = False
+    engine.setNumOfEpisodesForTraining(numOfEpisodes)
+    if backend == "array":
+        results = engine.applyPrioritizedSweepingOnQTable(environment)
+    else:
+        results = engine.applyPrioritizedSweeping(environment)
+    model = environment.model
+    largest = max((len(entries) for entries in model.predecessors if entries is not None), default=0)
+    return results, len(model), largest
+
+
+def main():
+    # PS with the partial model bounded to a few predecessors per state, no state may keep more than the bound
+    mapFile = sys.argv[1] if len(sys.argv) > 1 else "mapFiles/4halls.gwmap"
+    numOfEpisodes = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    bounds = [int(argument) for argument in sys.argv[3:]] or [1, 2, 4]
+
+    print("%s, %d episodes" % (mapFile, numOfEpisodes))
+    allBounded = True
+    for backend in ["object", "array"]:
+        for bound in [None] + bounds:
+            results, numOfEntries, largest = run(mapFile, 0, numOfEpisodes, bound, backend)
+            bounded = bound is None or largest <= bound
+            allBounded &= bounded
+            print("%-6s  bound %-4s  %8d actions  %6d model entries  %3d most per state  %8.0f backups/s  bounded %s" % (backend, bound, results["actions"], numOfEntries, largest, results["backupsPerSecond"], bounded))
+    sys.exit(0 if allBounded else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import sys
+
+from Environment import loadEnvironment
+from TrainingEngine import TrainingEngine
+
+
+def run(mapFile, seed, numOfEpisodes, incremental):
+    environment = loadEnvironment(mapFile)
+    engine = TrainingEngine()
+    engine.verbose = False
+    engine.setSeed(seed)
+    engine.setSubgoalRecomputation(incremental=incremental)
+    engine.trainUntilConvergence = False
+    engine.setNumOfEpisodesForTraining(numOfEpisodes)
+    return engine.applyPrioritizedSweeping(environment)
+
+
+def main():
+    # two PS runs with the same seed, subgoals and options included, have to take the same episodes
+    mapFile = sys.argv[1] if len(sys.argv) > 1 else "mapFiles/halls.gwmap"
+    numOfEpisodes = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    seeds = [int(argument) for argument in sys.argv[3:]] or [0, 1, 2]
+
+    print("%s, %d episodes" % (mapFile, numOfEpisodes))
+    allSame = True
+    for seed in seeds:
+        for incremental in [False, True]:
+            first = run(mapFile, seed, numOfEpisodes, incremental)
+            second = run(mapFile, seed, numOfEpisodes, incremental)
+            same = first["stepsPerEpisode"] == second["stepsPerEpisode"]
+            allSame &= same
+            print("seed %3d  incremental %-5s  %8d actions  %8.3f s  same %s" % (seed, incremental, first["actions"], first["wallTime"], same))
+    sys.exit(0 if allSame else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import random
+import sys
+import time
+
+import networkx as nx
+
+from Environment import loadEnvironment
+from GraphXv2 import GraphX
+
+
+def discoveryOrder(environment):
+    # edges as coordinate pairs, in the order a random walk from the start crosses them for the first time
+    random.seed(0)
+    full = GraphX()
+    full.createMapToGraph(environment.mapMatrix)
+    adjacency = full.graph.adj
+    node = full.intToStr(environment.startCoordinates)
+    numOfEdges = full.graph.subgraph(nx.node_connected_component(full.graph, node)).number_of_edges()
+    seen, edges = set(), []
+    while len(seen) < numOfEdges:
+        neighbour = random.choice(list(adjacency[node]))
+        edge = frozenset((node, neighbour))
+        if edge not in seen:
+            seen.add(edge)
+            edges.append((full.coordinates[node], full.coordinates[neighbour]))
+        node = neighbour
+    return edges
+
+
+def run(environment, edges, edgesPerUpdate, incremental):
+    graph = GraphX()
+    graph.incremental = incremental
+    startTime = time.perf_counter()
+    for start in range(0, len(edges), edgesPerUpdate):
+        for source, destination in edges[start:start + edgesPerUpdate]:
+            graph.addEdge(source, destination)
+        graph.setInitiationSets(5, 0.03, 3, environment.goalCoordinates)
+    return time.perf_counter() - startTime, dict(graph.initiationSets)
+
+
+def main():
+    # subgoal recomputation while a random walk discovers the map, from scratch against incremental path counts
+    mapFile = sys.argv[1] if len(sys.argv) > 1 else "mapFiles/hugeHalls.gwmap"
+    environment = loadEnvironment(mapFile)
+    edges = discoveryOrder(environment)
+
+    print("%s, %d edges" % (mapFile, len(edges)))
+    for edgesPerUpdate in [int(argument) for argument in sys.argv[2:]] or [1, 4, 16]:
+        fullTime, fullSets = run(environment, edges, edgesPerUpdate, False)
+        incrementalTime, incrementalSets = run(environment, edges, edgesPerUpdate, True)
+        print("every %3d edges  full %8.3f s  incremental %8.3f s  same %s" % (edgesPerUpdate, fullTime, incrementalTime, fullSets == incrementalSets))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import sys
+
+from Environment import loadEnvironment
+from TrainingEngine import TrainingEngine
+
+
+def run(mapFile, backend, sweepBatchSize, numOfUpdates, numOfEpisodes):
+    environment = loadEnvironment(mapFile)
+    engine = TrainingEngine()
+    engine.verbose = False
+    engine.setSeed(0)
+    engine.setBackend(backend)
+    engine.setNumOfUpdates(numOfUpdates)
+    engine.setSweepBatchSize(sweepBatchSize)
+    engine.trainUntilConvergence = False
+    engine.setNumOfEpisodesForTraining(numOfEpisodes)
+    return engine.applyPrioritizedSweeping(environment)
+
+
+def main():
+    # backups per second of the sweep loop against the one-by-one sweep over the State objects with subgoal options,
+    # batched top-k backups on the objects and on the flat array backend, which has no subgoal options
+    mapFile = sys.argv[1] if len(sys.argv) > 1 else "mapFiles/halls.gwmap"
+    numOfUpdates = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    numOfEpisodes = int(sys.argv[3]) if len(sys.argv) > 3 else 100
+
+    print("%s, %d updates per action, %d episodes" % (mapFile, numOfUpdates, numOfEpisodes))
+    baseline = None
+    for backend, sweepBatchSize in [("object", 1), ("object", 8), ("object", 32), ("object", 128), ("array", 1), ("array", 8), ("array", 32), ("array", 128)]:
+        results = run(mapFile, backend, sweepBatchSize, numOfUpdates, numOfEpisodes)
+        baseline = baseline or results["backupsPerSecond"]
+        print("%-6s batch %4d  %10d backups  %10.0f backups/s  %6.2fx  %8.3f s  last episode %d actions" % (backend, sweepBatchSize, results["backups"], results["backupsPerSecond"], results["backupsPerSecond"] / baseline, results["wallTime"], results["stepsPerEpisode"][-1]))
+
+
+if __name__ == "__main__":
+    main()
@@ -134,10 +134,14 @@ def convertGridToGraph(gridmap, graph):
                 
 
 #Module olarak kullanmak istersek bu method yeterli olacaktır.
-def get_bet_cen(gridmap):
+#pivotSampler verilirse merkeziyet örneklenen pivotlardan tahmin edilir
+def get_bet_cen(gridmap, pivotSampler=None):
     G=nx.Graph()
     convertGridToGraph(gridmap, G)
-    return nx.betweenness_centrality(G)
+    if pivotSampler is None:
+        return nx.betweenness_centrality(G)
+    tiles = [tuple(int(index) // pivotSampler.tileSize for index in node[1:-1].split("][")) for node in G]
+    return pivotSampler.betweenness(G, tiles)[0]
     
 def main():
     G=nx.Graph()
@@ -0,0 +1,44 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import csv
+import os
+import shutil
+import sys
+import tempfile
+
+from SweepRunner import runSweep
+
+
+def readRows(resultsFileName):
+    with open(resultsFileName, "r", newline="") as resultsFile:
+        return list(csv.DictReader(resultsFile))
+
+
+def main():
+    # a sweep with one configuration that raises has to record it as a failed row, finish the others and retry only
+    # the failed one when it is resumed
+    mapFile = sys.argv[1] if len(sys.argv) > 1 else "mapFiles/4halls.gwmap"
+    parameterGrid = {"sweepBatchSize": [1, "many"]}
+    resultsFolder = tempfile.mkdtemp()
+    resultsFileName = os.path.join(resultsFolder, "sweepResults.csv")
+
+    numOfRuns = runSweep(parameterGrid, [mapFile], resultsFileName, numOfEpisodes=3, numOfWorkers=1)
+    rows = readRows(resultsFileName)
+    failed = [row for row in rows if row["error"]]
+    finished = [row for row in rows if not row["error"]]
+    for row in rows:
+        print("sweepBatchSize %-5s  episodes %-2s  error %s" % (row["sweepBatchSize"], row["episodes"], row["error"] or "-"))
+    passed = numOfRuns == 2 and len(failed) == 1 and failed[0]["sweepBatchSize"] == "many" and len(finished) == 1 and finished[0]["episodes"] == "3"
+
+    numOfRetries = runSweep(parameterGrid, [mapFile], resultsFileName, numOfEpisodes=3, numOfWorkers=1)
+    print("resumed sweep ran %d of 2 configurations again" % numOfRetries)
+    passed &= numOfRetries == 1 and len(readRows(resultsFileName)) == 3
+    shutil.rmtree(resultsFolder)
+
+    print("passed" if passed else "FAILED")
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    main()
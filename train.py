@@ -0,0 +1,167 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import argparse
+import json
+import sys
+
+import numpy as np
+
+from ApproximateCentrality import PivotSampler
+from BatchTrainer import BatchTrainer
+from ConvergenceDetector import CombinedDetector, GreedyRolloutDetector, PolicyStabilityDetector, QValueChangeDetector, StepBudgetDetector
+from Environment import loadEnvironment
+from ParallelCentrality import CentralityPool
+from SequenceWriter import SEQUENCE_FORMATS
+from SubgoalCache import SubgoalCache
+from TrainingEngine import TrainingEngine
+
+
+def buildArgumentParser():
+    parser = argparse.ArgumentParser(description="Train QL or PS on a .gwmap file without the GUI and print the metrics as JSON.")
+    parser.add_argument("mapFiles", nargs="+", help="path of the .gwmap file, several maps of equal size with --agents")
+    parser.add_argument("--algorithm", choices=["ql", "ps"], default="ql")
+    parser.add_argument("--backend", choices=["object", "array"], default="object", help="keep Q-values on State objects or in a NumPy QTable")
+    parser.add_argument("--alpha", type=float, default=0.2)
+    parser.add_argument("--discount-factor", type=float, default=0.90)
+    parser.add_argument("--max-epsilon", type=float, default=0.35)
+    parser.add_argument("--min-epsilon", type=float, default=0.00001)
+    parser.add_argument("--epsilon-decay-factor", type=float, default=0.99992)
+    parser.add_argument("--epsilon-decay-mode", choices=["episode", "step"], default="episode")
+    parser.add_argument("--num-of-updates", type=int, default=15)
+    parser.add_argument("--sweep-batch-size", type=int, default=1, help="queued options backed up together by PS, 1 backs them up one at a time")
+    parser.add_argument("--max-predecessors", type=int, default=None, help="(predecessor, option) pairs the PS model keeps per state, the oldest is dropped for a new one")
+    parser.add_argument("--subgoal-edge-threshold", type=int, default=1, help="new graph edges that trigger a subgoal recomputation in PS")
+    parser.add_argument("--subgoal-interval", type=float, default=None, help="with --subgoal-thread, also recompute the subgoals after this many seconds once any edge was added")
+    parser.add_argument("--subgoal-thread", action="store_true", help="detect the PS subgoals on a background thread instead of at episode ends, the run then cannot be repeated from a seed")
+    parser.add_argument("--incremental-subgoals", action="store_true", help="update the path counts of the subgoal detection with the new edges instead of recounting")
+    parser.add_argument("--centrality-pivots", type=int, default=None, help="detect subgoals from the shortest paths of this many sampled sources instead of all")
+    parser.add_argument("--pivot-strategy", choices=["uniform", "stratified"], default="uniform", help="sample the pivots uniformly or spread over square tiles of --pivot-tile-size cells")
+    parser.add_argument("--pivot-tile-size", type=int, default=5)
+    parser.add_argument("--centrality-processes", type=int, default=None, help="split the exact subgoal path counts over this many processes")
+    parser.add_argument("--subgoal-cache", default=None, help="keep the subgoals found in this directory and reuse them for the same graph")
+    parser.add_argument("--subgoal-cache-size", type=float, default=64, help="megabytes the subgoal cache keeps before dropping the least recently used entries")
+    parser.add_argument("--priority-threshold", type=float, default=0.0000000001)
+    parser.add_argument("--imm-reward-at-goal", type=float, default=50)
+    parser.add_argument("--convergence-interval", type=int, default=15)
+    parser.add_argument("--variance-threshold", type=float, default=0.3)
+    parser.add_argument("--convergence-criterion", choices=["variance", "qvalue", "policy", "rollout"], default="variance", help="episode length variance, relative Q-value change, greedy policy stability or greedy rollouts from the start")
+    parser.add_argument("--q-change-threshold", type=float, default=0.001, help="relative Q-value change of the qvalue criterion")
+    parser.add_argument("--evaluation-interval", type=int, default=10, help="episodes between greedy rollouts of the rollout criterion")
+    parser.add_argument("--max-actions", type=int, default=None, help="also stop once this many actions were taken")
+    parser.add_argument("--stop-when-optimal", action="store_true", help="stop once the greedy path from the start is optimal")
+    parser.add_argument("--episodes", type=int, default=None, help="train for a fixed number of episodes instead of until convergence")
+    parser.add_argument("--sequence-file", default=None, help="write the action sequence to this file")
+    parser.add_argument("--sequence-format", choices=SEQUENCE_FORMATS, default="text", help="one action code per line, one byte per action or the indexed container read by SequenceReader")
+    parser.add_argument("--checkpoint", default=None, help="save a checkpoint to this .npz file every --checkpoint-interval episodes and at the end")
+    parser.add_argument("--checkpoint-interval", type=int, default=0)
+    parser.add_argument("--resume", default=None, help="continue training from this checkpoint")
+    parser.add_argument("--agents", type=int, default=None, help="train this many QL agents in lockstep with BatchTrainer, spread over the maps")
+    parser.add_argument("--seed", type=int, default=None, help="random seed of the run, a fresh one is drawn and reported otherwise")
+    parser.add_argument("--output", default=None, help="write the metrics to this file instead of stdout")
+    parser.add_argument("--quiet", action="store_true", help="do not print the summary line when writing to --output")
+    return parser
+
+
+def configureEngine(engine, arguments, environment):
+    engine.setBackend(arguments.backend)
+    engine.setSeed(arguments.seed)
+    engine.setAlpha(arguments.alpha)
+    engine.setDiscountFactor(arguments.discount_factor)
+    engine.setMaxEpsilon(arguments.max_epsilon)
+    engine.setMinEpsilon(arguments.min_epsilon)
+    engine.setEpsilonDecayFactor(arguments.epsilon_decay_factor)
+    engine.setEpsilonDecayMode(arguments.epsilon_decay_mode)
+    engine.setNumOfUpdates(arguments.num_of_updates)
+    engine.setSweepBatchSize(arguments.sweep_batch_size)
+    engine.setMaxPredecessorsPerState(arguments.max_predecessors)
+    engine.setSubgoalRecomputation(arguments.subgoal_edge_threshold, arguments.subgoal_interval, arguments.incremental_subgoals)
+    engine.setSubgoalThread(arguments.subgoal_thread)
+    if arguments.centrality_pivots is not None:
+        engine.setCentralitySampler(PivotSampler(arguments.centrality_pivots, arguments.pivot_strategy, arguments.pivot_tile_size, arguments.seed))
+    if arguments.centrality_processes is not None:
+        engine.setCentralityPool(CentralityPool(arguments.centrality_processes))
+    if arguments.subgoal_cache is not None:
+        engine.setSubgoalCache(SubgoalCache(arguments.subgoal_cache, int(arguments.subgoal_cache_size * 2 ** 20)))
+    engine.setPriorityThreshold(arguments.priority_threshold)
+    engine.setImmRewardAtGoal(arguments.imm_reward_at_goal)
+    engine.setConvergenceInterval(arguments.convergence_interval)
+    engine.setConvergenceThreshold(arguments.variance_threshold)
+    if arguments.convergence_criterion == "qvalue":
+        engine.setConvergenceDetector(QValueChangeDetector(arguments.q_change_threshold, arguments.convergence_interval))
+    elif arguments.convergence_criterion == "policy":
+        engine.setConvergenceDetector(PolicyStabilityDetector(arguments.convergence_interval))
+    elif arguments.convergence_criterion == "rollout":
+        engine.setConvergenceDetector(GreedyRolloutDetector(environment.transitionTable, environment.getStateId(environment.goalCoordinates), environment.getStateId(environment.startCoordinates), arguments.evaluation_interval))
+    if arguments.max_actions is not None:
+        engine.setConvergenceDetector(CombinedDetector([engine.convergenceDetector, StepBudgetDetector(arguments.max_actions)]))
+    engine.setStopWhenOptimal(arguments.stop_when_optimal)
+    if arguments.episodes is not None:
+        engine.trainUntilConvergence = False
+        engine.setNumOfEpisodesForTraining(arguments.episodes)
+    if arguments.sequence_file is not None:
+        engine.generateSequence = True
+        engine.sequenceFileName = arguments.sequence_file
+        engine.setSequenceFormat(arguments.sequence_format)
+    # stdout carries the JSON metrics unless --output is given
+    engine.verbose = arguments.output is not None and not arguments.quiet
+
+
+def main(argv=None):
+    arguments = buildArgumentParser().parse_args(argv)
+    if arguments.algorithm == "ps" and arguments.backend == "array":
+        sys.exit("The array backend has no subgoal options, train PS with --backend object.")
+    if arguments.algorithm == "ps" and arguments.convergence_criterion == "rollout":
+        sys.exit("The rollout criterion follows primitive actions only, train PS with another --convergence-criterion.")
+    # one seed drives the exploration and the pivot sampling, so that the reported seed repeats the whole run
+    if arguments.seed is None:
+        arguments.seed = int(np.random.SeedSequence().entropy)
+
+    environments = []
+    for mapFile in arguments.mapFiles:
+        environment = loadEnvironment(mapFile)
+        environment.setImmRewardAtGoal(arguments.imm_reward_at_goal)
+        environment.stateList[environment.goalCoordinates].immReward = arguments.imm_reward_at_goal
+        environments.append(environment)
+
+    if arguments.agents is not None or len(environments) > 1:
+        if arguments.algorithm != "ql":
+            sys.exit("Batched training supports QL only.")
+        if arguments.convergence_criterion == "rollout" and len(environments) > 1:
+            sys.exit("The rollout criterion needs a single map.")
+        unsupported = [flag for flag, isGiven in [("--stop-when-optimal", arguments.stop_when_optimal), ("--sequence-file", arguments.sequence_file is not None), ("--checkpoint", arguments.checkpoint is not None), ("--resume", arguments.resume is not None), ("--backend array", arguments.backend == "array")] if isGiven]
+        if unsupported:
+            sys.exit("Batched training does not support %s." % ", ".join(unsupported))
+        engine = BatchTrainer(arguments.seed)
+        configureEngine(engine, arguments, environments[0])
+        results = engine.applyBatchQLearning(environments, arguments.agents)
+    else:
+        engine = TrainingEngine()
+        configureEngine(engine, arguments, environments[0])
+        engine.setCheckpoint(arguments.checkpoint, arguments.checkpoint_interval)
+        if arguments.resume is not None:
+            try:
+                engine.loadCheckpoint(environments[0], arguments.resume)
+            except ValueError as error:
+                sys.exit(str(error))
+        if arguments.algorithm == "ql":
+            results = engine.applyQLearning(environments[0])
+        else:
+            results = engine.applyPrioritizedSweeping(environments[0])
+        if arguments.checkpoint is not None:
+            engine.saveCheckpoint(environments[0])
+        results["mapFile"] = arguments.mapFiles[0]
+
+    if engine.centralityPool is not None:
+        engine.centralityPool.close()
+
+    if arguments.output is None:
+        json.dump(results, sys.stdout)
+        sys.stdout.write("\n")
+    else:
+        with open(arguments.output, "w") as outputFile:
+            json.dump(results, outputFile)
+
+
+if __name__ == "__main__":
+    main()